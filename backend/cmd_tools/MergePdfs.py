@@ -84,16 +84,17 @@ def merge_pdfs(args: Dict[str, Any], db, fs: gridfs.GridFS) -> Dict[str, Any]:
         # Create merged PDF in memory
         merged_buffer = io.BytesIO()
         pdf_writer.write(merged_buffer)
-        merged_content = merged_buffer.getvalue()
+        merged_size = merged_buffer.seek(0, io.SEEK_END)
+        merged_buffer.seek(0)
         
-        logger.info(f"Merged PDF created successfully ({len(merged_content)} bytes)")
+        logger.info(f"Merged PDF created successfully ({merged_size} bytes)")
         
         # Generate filename for merged PDF
         merged_filename = f"merged_pdf_{len(file_ids)}_files.pdf"
         
         # Upload merged PDF to GridFS
         merged_file_id = fs.put(
-            merged_content,
+            merged_buffer,
             filename=merged_filename,
             content_type="application/pdf",
             metadata={
@@ -112,7 +113,7 @@ def merge_pdfs(args: Dict[str, Any], db, fs: gridfs.GridFS) -> Dict[str, Any]:
             "merged_filename": merged_filename,
             "total_pages": len(pdf_writer.pages),
             "original_files": processed_files,
-            "merged_size_bytes": len(merged_content)
+            "merged_size_bytes": merged_size
         }
         
     except Exception as e:
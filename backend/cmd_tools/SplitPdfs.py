@@ -99,9 +99,9 @@ def split_pdfs(args: Dict[str, Any], db, fs: gridfs.GridFS) -> Dict[str, Any]:
                 
                 logger.info(f"Added {page_filename} ({len(page_content)} bytes) to ZIP")
         
-        # Get ZIP content
-        zip_content = zip_buffer.getvalue()
-        logger.info(f"ZIP archive created successfully ({len(zip_content)} bytes, {total_pages} files)")
+        zip_size = zip_buffer.seek(0, io.SEEK_END)
+        zip_buffer.seek(0)
+        logger.info(f"ZIP archive created successfully ({zip_size} bytes, {total_pages} files)")
         
         # Generate filename for ZIP
         base_name = original_filename.rsplit('.', 1)[0]
@@ -109,7 +109,7 @@ def split_pdfs(args: Dict[str, Any], db, fs: gridfs.GridFS) -> Dict[str, Any]:
         
         # Upload ZIP to GridFS
         zip_file_id = fs.put(
-            zip_content,
+            zip_buffer,
             filename=zip_filename,
             content_type="application/zip",
             metadata={
@@ -138,7 +138,7 @@ def split_pdfs(args: Dict[str, Any], db, fs: gridfs.GridFS) -> Dict[str, Any]:
                 "size_bytes": len(file_content)
             },
             "split_files": split_files_info,
-            "zip_size_bytes": len(zip_content)
+            "zip_size_bytes": zip_size
         }
         
     except Exception as e:
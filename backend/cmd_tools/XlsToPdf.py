@@ -221,9 +221,10 @@ def xls_to_pdf(args: Dict[str, Any], db, fs: gridfs.GridFS) -> Dict[str, Any]:
         # Create merged PDF in memory
         merged_buffer = io.BytesIO()
         pdf_writer.write(merged_buffer)
-        merged_content = merged_buffer.getvalue()
+        merged_size = merged_buffer.seek(0, io.SEEK_END)
+        merged_buffer.seek(0)
         
-        logger.info(f"Merged PDF created successfully ({len(merged_content)} bytes, {total_sheets_converted} sheets)")
+        logger.info(f"Merged PDF created successfully ({merged_size} bytes, {total_sheets_converted} sheets)")
         
         # Generate filename for merged PDF
         if len(file_ids) == 1:
@@ -233,7 +234,7 @@ def xls_to_pdf(args: Dict[str, Any], db, fs: gridfs.GridFS) -> Dict[str, Any]:
         
         # Upload merged PDF to GridFS
         merged_file_id = fs.put(
-            merged_content,
+            merged_buffer,
             filename=merged_filename,
             content_type="application/pdf",
             metadata={
@@ -254,7 +255,7 @@ def xls_to_pdf(args: Dict[str, Any], db, fs: gridfs.GridFS) -> Dict[str, Any]:
             "total_pages": len(pdf_writer.pages),
             "total_sheets_converted": total_sheets_converted,
             "original_files": processed_files,
-            "merged_size_bytes": len(merged_content)
+            "merged_size_bytes": merged_size
         }
         
     except Exception as e:
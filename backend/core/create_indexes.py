@@ -44,6 +44,34 @@ async def create_indexes():
         ("date", -1)
     ], name="leaderboard_lookup")
     
+    # Index for time-based tmp files cleanup (GridFS only indexes filename+uploadDate)
+    await db["tmp_files.files"].create_index([
+        ("uploadDate", 1)
+    ], name="tmp_files_by_upload_date")
+    
+    # Index for command-based tmp files cleanup
+    await db.commands.create_index([
+        ("exit_state", 1),
+        ("completed_at", 1)
+    ], name="commands_by_state_completed")
+    
+    # Index for finding a recent command for the same video (find_recent_command)
+    await db.commands.create_index([
+        ("shell_command", 1),
+        ("args.video_id", 1),
+        ("created_at", -1)
+    ], name="commands_by_video_created")
+    
+    # Indexes for user file listings (newest first) and per-user lookups
+    await db["images.files"].create_index([
+        ("metadata.owner_email", 1),
+        ("uploadDate", -1)
+    ], name="images_by_owner_upload_date")
+    
+    await db["images.files"].create_index([
+        ("metadata.owner_id", 1)
+    ], name="images_by_owner_id")
+    
     print("✓ All indexes created successfully!")
     print("\nIndexes on daily_metrics:")
     indexes = await db.daily_metrics.list_indexes().to_list(length=None)
@@ -9,13 +9,32 @@ client = None
 database = None
 images_bucket = None
 
+def get_client():
+    """Get the process-wide motor client (created on first use)"""
+    global client
+    if client is None:
+        client = AsyncIOMotorClient(
+            settings.mongodb_url,
+            maxPoolSize=settings.mongodb_max_pool_size,
+            minPoolSize=settings.mongodb_min_pool_size,
+            waitQueueTimeoutMS=settings.mongodb_wait_queue_timeout_ms,
+            compressors=settings.mongodb_compressors,
+        )
+    return client
+
+def close_client():
+    """Close the process-wide motor client on shutdown"""
+    global client
+    if client is not None:
+        client.close()
+        client = None
+
 async def init_db():
     """Initialize database connection and models"""
-    global client, database, images_bucket
+    global database, images_bucket
     
-    # Create motor client
-    client = AsyncIOMotorClient(settings.mongodb_url)
-    database = client[settings.database_name]
+    # Reuse the shared motor client
+    database = get_client()[settings.database_name]
     
     # Initialize beanie with the User model
     await init_beanie(
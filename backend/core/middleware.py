@@ -0,0 +1,148 @@
+"""
+HTTP middlewares shared by the FastAPI app
+"""
+from fastapi import HTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .config import settings
+
+MB = 1024 * 1024
+
+# Per-path upload caps in bytes; other paths fall back to settings.max_upload_size_mb
+UPLOAD_SIZE_LIMITS = {
+    "/api/splitPdf": 200 * MB,
+    "/api/mergeImages": 500 * MB,
+}
+
+
+class LimitUploadSizeMiddleware:
+    """Reject uploads larger than the upload cap with a 413
+
+    A Content-Length over the cap is rejected before the body is read. Bodies
+    without one (chunked uploads) are counted while they are read, and the
+    request fails with a 413 as soon as the cap is crossed.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        max_size = UPLOAD_SIZE_LIMITS.get(scope["path"], settings.max_upload_size_mb * MB)
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None:
+            try:
+                size = int(content_length)
+            except ValueError:
+                response = JSONResponse(status_code=400, content={"detail": "Invalid Content-Length header"})
+                await response(scope, receive, send)
+                return
+            if size > max_size:
+                await self._too_large(size, max_size)(scope, receive, send)
+                return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    # An HTTPException passes through FastAPI's body parsing unchanged
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Upload too large (max {max_size // MB} MB)"
+                    )
+            return message
+
+        async def tracking_send(message: Message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as exc:
+            # Raised outside a route (no exception handler ran): answer here if still possible
+            if exc.status_code != 413 or response_started:
+                raise
+            await self._too_large(received, max_size)(scope, receive, send)
+
+    @staticmethod
+    def _too_large(size: int, max_size: int) -> JSONResponse:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Upload too large: {size} bytes (max {max_size // MB} MB)"}
+        )
+
+
+# Media types that are already compressed: gzipping them only burns CPU
+COMPRESSED_MEDIA_TYPE_PREFIXES = (
+    "image/",
+    "video/",
+    "audio/",
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/x-7z-compressed",
+    "application/x-rar-compressed",
+    "application/octet-stream",
+    "application/vnd.openxmlformats-officedocument.",  # docx/xlsx/pptx are zip archives
+)
+UNCOMPRESSED_MEDIA_TYPES = ("image/svg+xml",)
+
+# Temporary Content-Encoding that makes GZipMiddleware pass a response through untouched
+_SKIP_GZIP_ENCODING = "identity"
+
+
+class SelectiveGZipMiddleware:
+    """GZipMiddleware that skips responses whose media type is already compressed
+
+    GZipMiddleware leaves responses that already have a Content-Encoding alone, so
+    compressed media types get a temporary "identity" encoding on the way into it,
+    which is removed again on the way out.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500):
+        self.gzip = GZipMiddleware(self._mark_compressed(app), minimum_size=minimum_size)
+
+    @staticmethod
+    def _mark_compressed(app: ASGIApp) -> ASGIApp:
+        async def marked_app(scope: Scope, receive: Receive, send: Send):
+            async def marking_send(message: Message):
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+                    if (
+                        "content-encoding" not in headers
+                        and media_type.startswith(COMPRESSED_MEDIA_TYPE_PREFIXES)
+                        and media_type not in UNCOMPRESSED_MEDIA_TYPES
+                    ):
+                        headers["content-encoding"] = _SKIP_GZIP_ENCODING
+                await send(message)
+
+            await app(scope, receive, marking_send)
+
+        return marked_app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.gzip(scope, receive, send)
+            return
+
+        async def unmarking_send(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if headers.get("content-encoding") == _SKIP_GZIP_ENCODING:
+                    del headers["content-encoding"]
+            await send(message)
+
+        await self.gzip(scope, receive, unmarking_send)
@@ -0,0 +1,13 @@
+"""
+Response classes shared by the routes
+"""
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class OrjsonResponse(JSONResponse):
+    """JSON response rendered with orjson (faster than the stdlib json on large result sets)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
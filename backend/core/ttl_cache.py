@@ -0,0 +1,52 @@
+"""
+Small in-process cache whose entries expire after a TTL
+"""
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Dict-backed cache with per-entry expiry and a bounded size
+
+    When full, expired entries are dropped first, then the oldest ones
+    (dicts keep insertion order).
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the value cached under key, or None if missing/expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store value under key for ttl seconds (default: the cache's TTL)"""
+        now = time.monotonic()
+        self._entries.pop(key, None)  # Re-inserted below as the newest entry
+        if len(self._entries) >= self.max_size:
+            for stale_key in [k for k, (expires_at, _) in self._entries.items() if expires_at < now]:
+                del self._entries[stale_key]
+            while len(self._entries) >= self.max_size:
+                del self._entries[next(iter(self._entries))]
+        self._entries[key] = (now + (self.ttl if ttl is None else ttl), value)
+
+    def pop(self, key: Hashable) -> None:
+        """Drop the entry for key, if any"""
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
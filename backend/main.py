@@ -2,10 +2,11 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
-from core.database import init_db
+from core.database import init_db, close_client
 from core.auth import auth_backend, fastapi_users
 from schemas import UserCreate, UserRead, UserUpdate
 from core.create_indexes import create_indexes
+from core.middleware import LimitUploadSizeMiddleware, SelectiveGZipMiddleware
 import traceback
 import logging
 
@@ -30,6 +31,9 @@ from routes.lmnp_routes import router as lmnp_router
 # Import cleanup service
 from service.cleanup_service import start_cleanup_scheduler
 from service.seed_service import start_seed_scheduler
+from service.user_service import close_http_client
+from shell.command_worker import shutdown_pool as shutdown_command_workers
+from shell.command_manager import wait_for_running_commands
 from core.config import settings
 import os
 import tempfile
@@ -54,7 +58,12 @@ async def lifespan(app: FastAPI):
         print("🚫 Seed scheduler disabled")
 
     yield
-    # Shutdown (if needed)
+    # Shutdown
+    await close_http_client()
+    shutdown_command_workers()
+    # Let running commands record their final state before the client goes away
+    await wait_for_running_commands()
+    close_client()
 
 
 # Configure logging with cross-platform log file path
@@ -99,6 +108,12 @@ async def global_exception_handler(request: Request, exc: Exception):
         }
     )
 
+# Reject oversize uploads before the body is read
+app.add_middleware(LimitUploadSizeMiddleware)
+
+# Compress large JSON responses (trading leaderboards, file listings), not already-compressed downloads
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024)
+
 # Add CORS middleware to allow React app to call API
 app.add_middleware(
     CORSMiddleware,
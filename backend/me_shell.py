@@ -2,6 +2,9 @@
 """
 Python shell dispatcher for JSON-driven commands
 Usage: python me_shell.py <command_id>
+
+Also imported by the command worker processes (shell/command_worker.py), which call
+run_command() directly instead of starting a new interpreter per command.
 """
 
 import sys
@@ -10,12 +13,12 @@ import json
 import logging
 import traceback
 import pymongo
-from motor.motor_asyncio import AsyncIOMotorClient
 from gridfs import GridFS
 from bson import ObjectId
 from cmd_tools.tools_commands import COMMAND_REGISTRY
 from core.config import settings
-from core.database import init_db
+from core.database import init_db, get_client
+from typing import Optional, Tuple
 
 # Set up logging
 logging.basicConfig(
@@ -28,60 +31,66 @@ logging.basicConfig(
 )
 logger = logging.getLogger('me_shell')
 
-async def main():
-    """Main entry point for command execution"""
-    if len(sys.argv) < 2:
-        logger.error("Error: command_id is required")
-        print("Error: command_id is required", file=sys.stderr)
-        sys.exit(1)
+# Longest stderr kept for a failed command (the end of a traceback is the useful part)
+MAX_STDERR_CHARS = 64 * 1024
+
+def _tail(text: str, limit: int = MAX_STDERR_CHARS) -> str:
+    """Keep at most the last limit characters of text"""
+    return text if len(text) <= limit else f"...[truncated]\n{text[-limit:]}"
+
+# Sync database for GridFS and sync handlers - created on first use, reused across commands
+_sync_db: Optional[pymongo.database.Database] = None
+
+def _get_sync_db() -> pymongo.database.Database:
+    """Get the shared sync database (GridFS needs a sync client)"""
+    global _sync_db
+    if _sync_db is None:
+        _sync_db = pymongo.MongoClient(settings.mongodb_url)[settings.database_name]
+    return _sync_db
+
+async def run_command(command_id: str) -> Tuple[int, str, str]:
+    """
+    Run the handler of a command document and record its result in MongoDB
     
-    command_id = sys.argv[1]
+    init_db() must have been called in this process and event loop.
+    
+    Args:
+        command_id: The ID of the command to execute
+        
+    Returns:
+        Tuple of (exit_state, stdout, stderr): 0 on success, 1 on failure
+    """
     logger.info(f"Me_shell dispatcher started for command: {command_id}")
+    db = get_client()[settings.database_name]
     
     try:
-        # Initialize database connection (this sets up the global database variable)
-        logger.info("Initializing database connection via init_db()")
-        await init_db()
-        logger.info("Database initialized successfully")
-        
-        # Connect to MongoDB
-        logger.info(f"Connecting to MongoDB: {settings.mongodb_url}")
-        client = AsyncIOMotorClient(settings.mongodb_url)
-        db = client[settings.database_name]
-        logger.info(f"Connected to database: {settings.database_name}")
+        oid = ObjectId(command_id)
         
         # Load command from database
         logger.info(f"Fetching command document for ID: {command_id}")
-        command_doc = await db.commands.find_one({"_id": ObjectId(command_id)})
+        command_doc = await db.commands.find_one({"_id": oid})
         if not command_doc:
             logger.error(f"Command {command_id} not found in database")
-            print(f"Error: Command {command_id} not found", file=sys.stderr)
-            sys.exit(1)
+            return 1, "", f"Error: Command {command_id} not found"
         
         shell_command = command_doc.get("shell_command")
         args = command_doc.get("args", {})
         logger.info(f"Found command: {shell_command} with args: {args}")
         
         # Look up handler
-        logger.info(f"Available commands: {list(COMMAND_REGISTRY.keys())}")
         if shell_command not in COMMAND_REGISTRY:
             error_msg = f"Unknown command '{shell_command}'. Available: {list(COMMAND_REGISTRY.keys())}"
             logger.error(error_msg)
-            print(f"Error: {error_msg}", file=sys.stderr)
-            sys.exit(1)
+            return 1, "", f"Error: {error_msg}"
         
         handler = COMMAND_REGISTRY[shell_command]
         
         # Setup GridFS - use pymongo for GridFS since it needs sync client
-        logger.info("Setting up GridFS connection")
-        sync_client = pymongo.MongoClient(settings.mongodb_url)
-        sync_db = sync_client[settings.database_name]
+        sync_db = _get_sync_db()
         fs = GridFS(sync_db, collection="tmp_files")
-        logger.info("GridFS connection established")
         
         # Execute handler
         logger.info(f"Executing command: {shell_command}")
-        logger.info(f"Args: {json.dumps(args, indent=2)}")
         
         # Since we changed merge_pdfs to be sync, check if handler is async
         if asyncio.iscoroutinefunction(handler):
@@ -92,36 +101,35 @@ async def main():
             result = handler(args, sync_db, fs)
         
         # Update command with success
+        result_json = json.dumps(result, indent=2)
         logger.info("Updating command status with success result")
         await db.commands.update_one(
-            {"_id": ObjectId(command_id)},
+            {"_id": oid},
             {
                 "$set": {
                     "exit_state": 0,
-                    "stdout": json.dumps(result, indent=2),
+                    "stdout": result_json,
                     "stderr": None
                 }
             }
         )
         
         logger.info("Command completed successfully")
-        logger.info(f"Result: {json.dumps(result, indent=2)}")
-        print("Command completed successfully")
-        print(f"Result: {json.dumps(result, indent=2)}")
+        logger.info(f"Result: {result_json}")
+        # The result is already stored in the command document: don't send it back as well
+        return 0, "Command completed successfully\n", ""
         
     except Exception as e:
         # Update command with error
         error_msg = f"Command failed: {str(e)}"
-        stderr_output = f"{error_msg}\n\nTraceback:\n{traceback.format_exc()}"
+        stderr_output = _tail(f"{error_msg}\n\nTraceback:\n{traceback.format_exc()}")
         
         logger.error(f"Command execution error: {error_msg}")
         logger.exception("Full exception details:")
         
         try:
-            client = AsyncIOMotorClient(settings.mongodb_url)
-            db = client[settings.database_name]
             await db.commands.update_one(
-                {"_id": ObjectId(command_id)},
+                {"_id": ObjectId(command_id)},  # oid is unset if command_id itself was invalid
                 {
                     "$set": {
                         "exit_state": 1,
@@ -133,11 +141,34 @@ async def main():
             logger.info("Updated command status with error result")
         except Exception as update_error:
             logger.error(f"Failed to update command status: {update_error}")
-            print(f"Failed to update command status: {update_error}", file=sys.stderr)
         
-        print(error_msg, file=sys.stderr)
-        print(f"Full traceback:\n{traceback.format_exc()}", file=sys.stderr)
+        return 1, "", stderr_output
+
+async def main():
+    """Main entry point for command execution"""
+    if len(sys.argv) < 2:
+        logger.error("Error: command_id is required")
+        print("Error: command_id is required", file=sys.stderr)
+        sys.exit(1)
+    
+    command_id = sys.argv[1]
+    
+    try:
+        # Initialize database connection (this sets up the global database variable)
+        logger.info("Initializing database connection via init_db()")
+        await init_db()
+        logger.info("Database initialized successfully")
+    except Exception as e:
+        logger.exception("Database initialization failed:")
+        print(f"Database initialization failed: {str(e)}", file=sys.stderr)
         sys.exit(1)
+    
+    exit_state, stdout, stderr = await run_command(command_id)
+    if stdout:
+        print(stdout, end="")
+    if stderr:
+        print(stderr, file=sys.stderr)
+    sys.exit(exit_state)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -63,15 +63,15 @@ async def manual_cleanup(
         
         # Choose cleanup method based on request
         if request.cleanup_type == "time_based":
-            result = await cleanup_service.cleanup_old_files(request.max_age_hours)
+            result = await cleanup_service.cleanup_old_files(request.max_age_hours, detail=True)
             result["cleanup_type"] = "time_based"
             
         elif request.cleanup_type == "command_based":
-            result = await cleanup_service.cleanup_by_command_status()
+            result = await cleanup_service.cleanup_by_command_status(detail=True)
             result["cleanup_type"] = "command_based"
             
         else:  # "full" or any other value
-            result = await cleanup_service.full_cleanup(request.max_age_hours)
+            result = await cleanup_service.full_cleanup(request.max_age_hours, detail=True)
             result["cleanup_type"] = "full"
         
         # Add metadata
@@ -98,7 +98,7 @@ async def emergency_cleanup(user: User = Depends(current_active_user)):
         cleanup_service = TmpFilesCleanupService()
         
         # Emergency cleanup: delete all files (max_age_hours = 0)
-        result = await cleanup_service.cleanup_old_files(max_age_hours=0)
+        result = await cleanup_service.cleanup_old_files(max_age_hours=0, detail=True)
         
         # Add emergency metadata
         result["cleanup_type"] = "emergency"
@@ -1,12 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from core.auth import User
 from core.auth import current_active_user
 from service.user_service import UserService
-from service.file_service import FileService
+from service.file_service import file_service, DEFAULT_FILE_PAGE_SIZE, MAX_FILE_PAGE_SIZE
 from typing import Dict, Any
-import io
 
 router = APIRouter()
 
@@ -122,11 +121,14 @@ async def register_user(request: RegisterRequest):
 
 # File Management Routes (Protected) - Using GridFS
 @router.get("/files")
-async def list_files(user: User = Depends(current_active_user)):
-    """List user's files using GridFS"""
+async def list_files(
+    limit: int = Query(DEFAULT_FILE_PAGE_SIZE, ge=1, le=MAX_FILE_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    user: User = Depends(current_active_user)
+):
+    """List user's files using GridFS, newest first"""
     try:
-        file_service = FileService()
-        files = await file_service.list_user_files(user.email, str(user.id))
+        files = await file_service.list_user_files(user.email, str(user.id), limit=limit, offset=offset)
         
         return {
             "files": files,
@@ -140,15 +142,9 @@ async def list_files(user: User = Depends(current_active_user)):
 async def upload_file(file: UploadFile = File(), user: User = Depends(current_active_user)):
     """Upload a file using GridFS"""
     try:
-        file_service = FileService()
-        
-        # Read file content
-        content = await file.read()
-        
+        # Stream the file content into GridFS
         result = await file_service.upload_file(
-            file_content=content,
-            filename=file.filename,
-            content_type=file.content_type,
+            file=file,
             user_email=user.email,
             user_id=str(user.id)
         )
@@ -165,8 +161,6 @@ async def upload_file(file: UploadFile = File(), user: User = Depends(current_ac
 async def delete_file(file_id: str, user: User = Depends(current_active_user)):
     """Delete a file using GridFS"""
     try:
-        file_service = FileService()
-        
         result = await file_service.delete_file(file_id, user.email, str(user.id))
         
         if result.get("success"):
@@ -186,18 +180,19 @@ async def delete_file(file_id: str, user: User = Depends(current_active_user)):
 async def download_file(file_id: str, user: User = Depends(current_active_user)):
     """Download a file using GridFS"""
     try:
-        file_service = FileService()
-        
         # Download file content with user verification
         file_data = await file_service.download_file(file_id, user.email, str(user.id))
         if not file_data:
             raise HTTPException(status_code=404, detail="File not found or access denied")
         
-        # Create streaming response
+        # Stream the file straight from GridFS
         return StreamingResponse(
-            io.BytesIO(file_data["content"]),
+            file_data["stream"],
             media_type=file_data["content_type"],
-            headers={"Content-Disposition": f"attachment; filename={file_data['filename']}"}
+            headers={
+                "Content-Disposition": f"attachment; filename={file_data['filename']}",
+                "Content-Length": str(file_data["size"])
+            }
         )
     except HTTPException:
         raise
@@ -208,7 +203,6 @@ async def download_file(file_id: str, user: User = Depends(current_active_user))
 async def get_file_info(file_id: str, user: User = Depends(current_active_user)):
     """Get file information using GridFS"""
     try:
-        file_service = FileService()
         file_info = await file_service.get_file_info(file_id, user.email, str(user.id))
         
         if not file_info:
@@ -232,8 +226,6 @@ async def rename_file_post(
 ):
     """Rename a file (update display name only) - POST operation"""
     try:
-        file_service = FileService()
-        
         result = await file_service.rename_file(
             file_id=file_id,
             new_display_name=request.new_name,
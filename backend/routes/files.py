@@ -5,7 +5,7 @@ Handles downloading of temporary/processed files without requiring user authenti
 
 from fastapi import APIRouter, HTTPException, Path
 from fastapi.responses import StreamingResponse
-from service.file_service import FileService
+from service.file_service import file_service
 import io
 from bson import ObjectId
 
@@ -39,11 +39,8 @@ async def download_processed_file(
                 detail=f"Invalid file ID format: {file_id}"
             )
         
-        # Use FileService to download from tmp_files bucket
-        file_service = FileService()
-        
         # Get the tmp_files bucket
-        bucket = await file_service._get_tmp_bucket()
+        bucket = file_service._tmp_bucket
         
         # Download the file content using the same pattern as FileService
         content_stream = io.BytesIO()
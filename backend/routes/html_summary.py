@@ -3,20 +3,21 @@ HtmlSummary API route
 Handles text/HTML content submission and summary command creation
 """
 
-import asyncio
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Body
 from pydantic import BaseModel
 from typing import Optional
 from core.auth import User
 from core.auth import current_active_user
-from shell.command_manager import create_command, process_command
+from shell.command_manager import HANDLERS
 
 # Set up logger for this module
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+submit_html_summary = HANDLERS["HtmlSummary"]
+
 class HtmlSummaryRequest(BaseModel):
     content: str = Body(..., description="Text content to summarize")
     title: Optional[str] = None
@@ -46,11 +47,10 @@ async def html_summary_endpoint(
         )
     
     try:
-        # Create html_summary command
+        # Create html_summary command and start processing it in the background
         logger.info(f"🚀 Creating HTML summary command")
-        command_id = await create_command(
-            shell_command="HtmlSummary",
-            args={
+        command_id = await submit_html_summary(
+            {
                 "content": request.content,
                 "title": request.title or "Content Summary",
                 "user_id": str(user.id)
@@ -59,10 +59,6 @@ async def html_summary_endpoint(
         
         logger.info(f"📝 Command created with ID: {command_id}")
         
-        # Start command processing in background
-        logger.info("⚡ Starting command processing in background...")
-        asyncio.create_task(process_command(command_id))
-        
         # Return command ID for client polling
         logger.info(f"✅ HTML summary command initiated successfully: {command_id}")
         return {
@@ -3,18 +3,19 @@ LMNP Routes
 Routes FastAPI pour la gestion des données LMNP (Location Meublée Non Professionnelle)
 """
 
-import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from core.auth import User, current_active_user
 from core.database import get_database
 from cmd_accountant.lmnp_data_manager import LmnpDataManager
-from shell.command_manager import create_command, process_command
+from shell.command_manager import HANDLERS
 from typing import Dict, Any, List
 from pydantic import BaseModel
 from datetime import datetime
 
 router = APIRouter()
 
+submit_generate_lmnp_liasse = HANDLERS["GenerateLmnpLiasse"]
+
 
 # ============================================================================
 # Request Models
@@ -452,17 +453,13 @@ async def generate_liasse_endpoint(
     3. Retourner command_id pour polling
     """
     try:
-        command_id = await create_command(
-            shell_command="GenerateLmnpLiasse",
-            args={
+        command_id = await submit_generate_lmnp_liasse(
+            {
                 "user_id": str(user.id),
                 "fiscal_year": fiscal_year
             }
         )
         
-        # Start processing asynchronously
-        asyncio.create_task(process_command(command_id))
-        
         return {
             "success": True,
             "command_id": command_id,
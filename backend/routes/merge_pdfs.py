@@ -3,20 +3,21 @@ MergePdfs API route
 Handles PDF file upload and merge command creation
 """
 
-import asyncio
 import logging
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from typing import List
 from core.auth import User
 from core.auth import current_active_user
-from service.file_service import FileService
-from shell.command_manager import create_command, process_command
+from service.file_service import file_service
+from shell.command_manager import HANDLERS
 
 # Set up logger for this module
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+submit_merge_pdfs = HANDLERS["MergePdfs"]
+
 @router.post("/mergePdfs")
 async def merge_pdfs_endpoint(
     files: List[UploadFile] = File(...),
@@ -53,19 +54,15 @@ async def merge_pdfs_endpoint(
             )
     
     try:
-        logger.info("🔧 Creating FileService instance...")
-        file_service = FileService()
         uploaded_file_ids = []
         
         # Upload each file to GridFS tmp_files bucket
         for i, file in enumerate(files):
             logger.info(f"📤 Uploading file {i+1}: {file.filename}")
             
-            # Read file content
-            content = await file.read()
-            logger.info(f"📊 File size: {len(content)} bytes")
+            logger.info(f"📊 File size: {file.size} bytes")
             
-            if len(content) == 0:
+            if file.size == 0:
                 logger.error(f"❌ Empty file: {file.filename}")
                 raise HTTPException(
                     status_code=400,
@@ -75,9 +72,7 @@ async def merge_pdfs_endpoint(
             # Upload to tmp_files bucket (different from user files)
             logger.info(f"🗃️ Calling upload_temp_file for {file.filename}")
             result = await file_service.upload_temp_file(
-                file_content=content,
-                filename=file.filename,
-                content_type=file.content_type,
+                file=file,
                 user_email=user.email,
                 user_id=str(user.id)
             )
@@ -94,11 +89,10 @@ async def merge_pdfs_endpoint(
             uploaded_file_ids.append(result["file_id"])
             logger.info(f"✅ File uploaded with ID: {result['file_id']}")
         
-        # Create merge command
+        # Create merge command and start processing it in the background
         logger.info(f"🚀 Creating merge command with file IDs: {uploaded_file_ids}")
-        command_id = await create_command(
-            shell_command="MergePdfs",
-            args={
+        command_id = await submit_merge_pdfs(
+            {
                 "file_ids": uploaded_file_ids,
                 "user_id": str(user.id),
                 "user_email": user.email
@@ -107,10 +101,6 @@ async def merge_pdfs_endpoint(
         
         logger.info(f"✅ Command created with ID: {command_id}")
         
-        # Start command processing asynchronously
-        logger.info("🔄 Starting async command processing...")
-        asyncio.create_task(process_command(command_id))
-        
         logger.info("🎉 PDF merge request completed successfully")
         return {
             "success": True,
@@ -3,19 +3,20 @@ PdfToHtml API route
 Handles PDF file upload and HTML summary generation command creation
 """
 
-import asyncio
 import logging
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from core.auth import User
 from core.auth import current_active_user
-from service.file_service import FileService
-from shell.command_manager import create_command, process_command
+from service.file_service import file_service
+from shell.command_manager import HANDLERS
 
 # Set up logger for this module
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+submit_pdf_to_html = HANDLERS["PdfToHtml"]
+
 @router.post("/pdfToHtml")
 async def pdf_to_html_endpoint(
     file: UploadFile = File(...),
@@ -44,15 +45,9 @@ async def pdf_to_html_endpoint(
         )
     
     try:
-        logger.info("🔧 Creating FileService instance...")
-        file_service = FileService()
-        
-        # Read file content
-        logger.info(f"📖 Reading file content...")
-        content = await file.read()
-        logger.info(f"📊 File size: {len(content)} bytes")
+        logger.info(f"📊 File size: {file.size} bytes")
         
-        if len(content) == 0:
+        if file.size == 0:
             logger.error(f"❌ Empty file: {file.filename}")
             raise HTTPException(
                 status_code=400,
@@ -62,9 +57,7 @@ async def pdf_to_html_endpoint(
         # Upload to tmp_files bucket
         logger.info(f"🗃️ Calling upload_temp_file for {file.filename}")
         result = await file_service.upload_temp_file(
-            file_content=content,
-            filename=file.filename,
-            content_type=file.content_type,
+            file=file,
             user_email=user.email,
             user_id=str(user.id)
         )
@@ -81,19 +74,12 @@ async def pdf_to_html_endpoint(
         file_id = result["file_id"]
         logger.info(f"✅ File uploaded with ID: {file_id}")
         
-        # Create pdf_to_html command
+        # Create pdf_to_html command and start processing it in the background
         logger.info(f"🚀 Creating PDF to HTML command with file ID: {file_id}")
-        command_id = await create_command(
-            shell_command="PdfToHtml",
-            args={"file_id": file_id}
-        )
+        command_id = await submit_pdf_to_html({"file_id": file_id})
         
         logger.info(f"📝 Command created with ID: {command_id}")
         
-        # Start command processing in background
-        logger.info("⚡ Starting command processing in background...")
-        asyncio.create_task(process_command(command_id))
-        
         # Return command ID for client polling
         logger.info(f"✅ PDF to HTML command initiated successfully: {command_id}")
         return {
@@ -3,19 +3,20 @@ SplitPdfs API route
 Handles PDF file upload and split command creation
 """
 
-import asyncio
 import logging
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from core.auth import User
 from core.auth import current_active_user
-from service.file_service import FileService
-from shell.command_manager import create_command, process_command
+from service.file_service import file_service
+from shell.command_manager import HANDLERS
 
 # Set up logger for this module
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+submit_split_pdfs = HANDLERS["SplitPdfs"]
+
 @router.post("/splitPdf")
 async def split_pdf_endpoint(
     file: UploadFile = File(...),
@@ -32,70 +33,55 @@ async def split_pdf_endpoint(
     5. Return command ID for polling
     """
     
-    logger.info(f"✂️ Starting PDF split for user {user.email} with file {file.filename}")
+    logger.info("Starting PDF split for user %s with file %s", user.email, file.filename)
     
     # Validate file is a PDF
-    logger.info(f"📁 File: {file.filename} ({file.content_type})")
+    logger.debug("File: %s (%s)", file.filename, file.content_type)
     if not file.content_type or not file.content_type.startswith('application/pdf'):
-        logger.error(f"❌ Invalid file type: {file.content_type}")
+        logger.error("Invalid file type: %s", file.content_type)
         raise HTTPException(
             status_code=400,
             detail=f"File '{file.filename}' is not a PDF. Only PDF files are allowed."
         )
     
     try:
-        logger.info("🔧 Creating FileService instance...")
-        file_service = FileService()
-        
-        # Read file content
-        logger.info(f"📖 Reading file content...")
-        content = await file.read()
-        logger.info(f"📊 File size: {len(content)} bytes")
+        logger.debug("File size: %s bytes", file.size)
         
-        if len(content) == 0:
-            logger.error(f"❌ Empty file: {file.filename}")
+        if file.size == 0:
+            logger.error("Empty file: %s", file.filename)
             raise HTTPException(
                 status_code=400,
                 detail=f"File '{file.filename}' is empty"
             )
         
         # Upload to tmp_files bucket
-        logger.info(f"🗃️ Calling upload_temp_file for {file.filename}")
         result = await file_service.upload_temp_file(
-            file_content=content,
-            filename=file.filename,
-            content_type=file.content_type,
+            file=file,
             user_email=user.email,
             user_id=str(user.id)
         )
         
-        logger.info(f"📋 Upload result: {result}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Upload result: %s", result)
         
         if not result.get("success"):
-            logger.error(f"❌ Upload failed: {result}")
+            logger.error("Upload failed: %s", result)
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to upload file '{file.filename}': {result.get('error')}"
             )
         
         file_id = result["file_id"]
-        logger.info(f"✅ File uploaded with ID: {file_id}")
-        
-        # Create split command
-        logger.info(f"🚀 Creating split command with file ID: {file_id}")
-        command_id = await create_command(
-            shell_command="SplitPdfs",
-            args={"file_id": file_id}
-        )
+        logger.debug("File uploaded with ID: %s", file_id)
         
-        logger.info(f"📝 Command created with ID: {command_id}")
+        # Create split command and start processing it in the background
+        logger.debug("Creating split command with file ID: %s", file_id)
+        command_id = await submit_split_pdfs({"file_id": file_id})
         
-        # Start command processing in background
-        logger.info("⚡ Starting command processing in background...")
-        asyncio.create_task(process_command(command_id))
+        logger.debug("Command created with ID: %s", command_id)
         
         # Return command ID for client polling
-        logger.info(f"✅ Split command initiated successfully: {command_id}")
+        logger.info("Split command %s started for user %s", command_id, user.email)
         return {
             "success": True,
             "command_id": command_id,
@@ -107,7 +93,7 @@ async def split_pdf_endpoint(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Unexpected error in split_pdf_endpoint: {str(e)}")
+        logger.error("Unexpected error in split_pdf_endpoint: %s", e)
         logger.exception("Full exception details:")
         raise HTTPException(
             status_code=500,
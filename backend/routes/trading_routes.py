@@ -1,9 +1,12 @@
 from urllib3 import request
 from fastapi import APIRouter, Depends, HTTPException, Request
+from core.responses import OrjsonResponse
 from pydantic import BaseModel
 from cmd_trading.seed_instruments import seed_instruments
 from cmd_trading.flow_stock_metrics import seed_instrument_prices, seed_leaderboards_only
 from core.database import get_database
+from core.ttl_cache import TTLCache
+from service.seed_service import run_seed_now, on_seed_complete, seconds_until_next_seed
 from datetime import datetime, timedelta
 from bson import ObjectId
 import logging
@@ -22,6 +25,16 @@ def serialize_mongo_doc(doc):
 
 router = APIRouter()
 
+# Leaderboards are regenerated at most once a day, so full result sets are
+# cached in-process and paginated in Python instead of re-running the pipeline.
+# The cache is dropped after every seed run (see on_seed_complete below).
+QUERY_CACHE_TTL_SECONDS = 3600
+QUERY_CACHE_MAX_SIZE = 256
+_query_cache = TTLCache(QUERY_CACHE_TTL_SECONDS, QUERY_CACHE_MAX_SIZE)
+
+# Seeds write new daily_metrics/leaderboards: cached results are stale from then on
+on_seed_complete(_query_cache.clear)
+
 PERIOD_MAP = {
     "5d": 5,
     "1M": 21,
@@ -31,7 +44,7 @@ PERIOD_MAP = {
     "52w": 252,
 }
 
-@router.post("/trading/named_query")
+@router.post("/trading/named_query", response_class=OrjsonResponse)
 async def query_trading_data(request: Request):
     params = await request.json()
     db = get_database()
@@ -46,49 +59,11 @@ async def query_trading_data(request: Request):
             return {"result": {"items": [], "total": 0, "start": start, "limit": limit}}
         
         latest_date = latest_metric["date"]
-        logger.info(f"[NAMED_QUERY] Fetching stacked_ma_trend stocks for date: {latest_date}")
-        
-        # Find all stocks with stacked_ma_trend = true
-        pipeline = [
-            {
-                "$match": {
-                    "date": latest_date,
-                    "stacked_ma_trend": True
-                }
-            },
-            {
-                "$lookup": {
-                    "from": "instruments",
-                    "localField": "instrumentId",
-                    "foreignField": "_id",
-                    "as": "instrument"
-                }
-            },
-            {
-                "$unwind": "$instrument"
-            },
-            {
-                "$project": {
-                    "instrumentId": 1,
-                    "symbol": 1,
-                    "date": 1,
-                    "last_price": 1,
-                    "volume": 1,
-                    "ma50": 1,
-                    "ma100": 1,
-                    "ma200": 1,
-                    "ema20": 1,
-                    "change_pct_from_low_5d": 1,
-                    "name": "$instrument.name"
-                }
-            },
-            {
-                "$sort": {"change_pct_from_low_5d": -1}  # Sort by 5d performance descending (best first)
-            }
-        ]
-        
-        cursor = db.daily_metrics.aggregate(pipeline)
-        all_stocks = await cursor.to_list(length=None)
+        cache_key = ("named_query", named_query, latest_date)
+        all_stocks = _query_cache.get(cache_key)
+        if all_stocks is None:
+            all_stocks = await _fetch_stacked_ma_trend(db, latest_date)
+            _query_cache.set(cache_key, all_stocks, min(QUERY_CACHE_TTL_SECONDS, seconds_until_next_seed()))
         
         total = len(all_stocks)
         paginated_stocks = all_stocks[start:start + limit]
@@ -96,7 +71,7 @@ async def query_trading_data(request: Request):
         logger.info(f"[NAMED_QUERY] Found {total} stocks with stacked MA trend, returning {len(paginated_stocks)} (from {start})")
         
         result = {
-            "items": serialize_mongo_doc(paginated_stocks),
+            "items": paginated_stocks,
             "total": total,
             "start": start,
             "limit": limit,
@@ -107,7 +82,54 @@ async def query_trading_data(request: Request):
     
     return {"error": "Unknown named_query"}
 
-@router.post("/trading/data")
+async def _fetch_stacked_ma_trend(db, latest_date):
+    """Fetch all stocks with stacked_ma_trend for latest_date, best 5d performers first"""
+    logger.info(f"[NAMED_QUERY] Fetching stacked_ma_trend stocks for date: {latest_date}")
+
+    # Find all stocks with stacked_ma_trend = true
+    pipeline = [
+        {
+            "$match": {
+                "date": latest_date,
+                "stacked_ma_trend": True
+            }
+        },
+        {
+            "$lookup": {
+                "from": "instruments",
+                "localField": "instrumentId",
+                "foreignField": "_id",
+                "as": "instrument"
+            }
+        },
+        {
+            "$unwind": "$instrument"
+        },
+        {
+            "$project": {
+                "_id": {"$toString": "$_id"},
+                "instrumentId": {"$toString": "$instrumentId"},
+                "symbol": 1,
+                "date": 1,
+                "last_price": 1,
+                "volume": 1,
+                "ma50": 1,
+                "ma100": 1,
+                "ma200": 1,
+                "ema20": 1,
+                "change_pct_from_low_5d": 1,
+                "name": "$instrument.name"
+            }
+        },
+        {
+            "$sort": {"change_pct_from_low_5d": -1}  # Sort by 5d performance descending (best first)
+        }
+    ]
+    
+    cursor = db.daily_metrics.aggregate(pipeline)
+    return await cursor.to_list(length=None)
+
+@router.post("/trading/data", response_class=OrjsonResponse)
 async def get_trading_data(request: Request):
     params = await request.json()
     db = get_database()
@@ -127,20 +149,21 @@ async def get_trading_data(request: Request):
         if symbol:
             q["symbol"] = symbol
         stocks = await db.instruments.find(q).to_list(length=None)
+        # Filtrage par période sur daily_bars et metrics (identique pour chaque instrument)
+        date_filter = None
+        if period in PERIOD_MAP:
+            end_str = date or datetime.utcnow().strftime("%Y-%m-%d")
+            end_dt = datetime.strptime(end_str, "%Y-%m-%d")
+            start_str = (end_dt - timedelta(days=PERIOD_MAP[period] - 1)).strftime("%Y-%m-%d")
+            date_filter = {"$gte": start_str, "$lte": end_str}
+        elif date:
+            date_filter = date
         for stock in stocks:
             bars_query = {"instrumentId": stock["_id"]}
             metrics_query = {"instrumentId": stock["_id"]}
-            # Filtrage par période sur daily_bars et metrics
-            if period in PERIOD_MAP:
-                n_days = PERIOD_MAP[period]
-                end_date = date or datetime.utcnow().strftime("%Y-%m-%d")
-                end_dt = datetime.strptime(end_date, "%Y-%m-%d")
-                start_dt = end_dt - timedelta(days=n_days-1)
-                bars_query["date"] = {"$gte": start_dt.strftime("%Y-%m-%d"), "$lte": end_dt.strftime("%Y-%m-%d")}
-                metrics_query["date"] = {"$gte": start_dt.strftime("%Y-%m-%d"), "$lte": end_dt.strftime("%Y-%m-%d")}
-            elif date:
-                bars_query["date"] = date
-                metrics_query["date"] = date
+            if date_filter is not None:
+                bars_query["date"] = date_filter
+                metrics_query["date"] = date_filter
             stock["daily_bars"] = await db.daily_bars.find(bars_query).to_list(length=None)
             stock["metrics"] = await db.daily_metrics.find(metrics_query).to_list(length=None)
         result = serialize_mongo_doc(stocks)
@@ -153,42 +176,25 @@ async def get_trading_data(request: Request):
         if leaderboard_type:
             q["type"] = leaderboard_type
         
-        logger.info(f"[LEADERBOARD] MongoDB query: {q}")
-        
-        # Use aggregation pipeline to paginate directly in MongoDB
-        # 1. Match by period/date/type
-        # 2. Filter only leaderboards with items
-        # 3. Sort by date descending
-        # 4. Limit to 1 (most recent)
-        # 5. Add total count of items
-        # 6. Slice the items array for pagination
-        pipeline = [
-            {"$match": q},
-            {"$match": {"items": {"$exists": True, "$ne": []}}},
-            {"$sort": {"date": -1}},
-            {"$limit": 1},
-            {"$project": {
-                "date": 1,
-                "period": 1,
-                "type": 1,
-                "generatedAt": 1,
-                "total": {"$size": "$items"},
-                "items": {"$slice": ["$items", start, limit]}
-            }}
-        ]
-        
-        cursor = db.leaderboards.aggregate(pipeline)
-        leaderboards = await cursor.to_list(length=None)
+        cache_key = ("leaderboard", period, date or "latest", leaderboard_type)
+        leaderboard = _query_cache.get(cache_key)
+        if leaderboard is None:
+            leaderboard = await _fetch_leaderboard(db, q)
+            if leaderboard:
+                # "Latest" changes with the next seed, possibly run by another process
+                ttl = QUERY_CACHE_TTL_SECONDS if date else min(QUERY_CACHE_TTL_SECONDS, seconds_until_next_seed())
+                _query_cache.set(cache_key, leaderboard, ttl)
         
-        if leaderboards:
-            leaderboard = leaderboards[0]
-            logger.info(f"[LEADERBOARD] Returning {len(leaderboard['items'])} items (from {start}) out of {leaderboard['total']} total for date {leaderboard['date']}")
+        if leaderboard:
+            items = leaderboard["items"][start:start + limit]
+            logger.info(f"[LEADERBOARD] Returning {len(items)} items (from {start}) out of {leaderboard['total']} total for date {leaderboard['date']}")
             
-            result = serialize_mongo_doc({
+            result = {
                 **leaderboard,
+                'items': items,
                 'start': start,
                 'limit': limit
-            })
+            }
         else:
             logger.info(f"[LEADERBOARD] No leaderboard with items found")
             result = {"items": [], "total": 0, "start": start, "limit": limit}
@@ -196,20 +202,57 @@ async def get_trading_data(request: Request):
         return {"error": "Invalid type. Use 'stock' or 'leaderboard'."}
     return {"result": result}
 
+async def _fetch_leaderboard(db, q):
+    """Fetch the most recent non-empty leaderboard matching q, or None"""
+    logger.info(f"[LEADERBOARD] MongoDB query: {q}")
+    
+    # 1. Match by period/date/type
+    # 2. Filter only leaderboards with items
+    # 3. Sort by date descending
+    # 4. Limit to 1 (most recent)
+    # 5. Add total count of items
+    # ObjectIds are stringified server-side so the result is JSON-ready as is
+    pipeline = [
+        {"$match": q},
+        {"$match": {"items": {"$exists": True, "$ne": []}}},
+        {"$sort": {"date": -1}},
+        {"$limit": 1},
+        {"$project": {
+            "_id": {"$toString": "$_id"},
+            "date": 1,
+            "period": 1,
+            "type": 1,
+            "generatedAt": 1,
+            "total": {"$size": "$items"},
+            "items": {"$map": {
+                "input": "$items",
+                "as": "it",
+                "in": {"$mergeObjects": [
+                    "$$it",
+                    {"instrumentId": {"$toString": "$$it.instrumentId"}}
+                ]}
+            }}
+        }}
+    ]
+    
+    cursor = db.leaderboards.aggregate(pipeline)
+    leaderboards = await cursor.to_list(length=None)
+    return leaderboards[0] if leaderboards else None
+
 #### Seeding Endpoints ####
 @router.post("/admin/seed/instruments")
 async def seed_instruments_route():
-    await seed_instruments()
+    await run_seed_now(seed_instruments)
     return {"status": "ok"}
 
 @router.post("/admin/seed/daily_prices")
 async def seed_daily_prices_route():
-    await seed_instrument_prices()
+    await run_seed_now(seed_instrument_prices)
     return {"status": "ok"}
 
 @router.post("/admin/seed/leaderboards")
 async def seed_leaderboards_route():
-    await seed_leaderboards_only()
+    await run_seed_now(seed_leaderboards_only)
     return {"status": "ok"}
 
 
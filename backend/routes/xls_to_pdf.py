@@ -3,20 +3,21 @@ XlsToPdf API route
 Handles Excel file upload and conversion command creation
 """
 
-import asyncio
 import logging
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from typing import List
 from core.auth import User
 from core.auth import current_active_user
-from service.file_service import FileService
-from shell.command_manager import create_command, process_command
+from service.file_service import file_service
+from shell.command_manager import HANDLERS
 
 # Set up logger for this module
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+submit_xls_to_pdf = HANDLERS["XlsToPdf"]
+
 # Supported Excel MIME types
 SUPPORTED_EXCEL_TYPES = [
     'application/vnd.ms-excel',  # .xls
@@ -40,10 +41,10 @@ async def xls_to_pdf_endpoint(
     5. Return command ID for polling
     """
     
-    logger.info(f"🔥 Starting Excel to PDF conversion for user {user.email} with {len(files)} files")
+    logger.info("Starting Excel to PDF conversion for user %s with %d files", user.email, len(files))
     
     if len(files) < 1:
-        logger.warning(f"❌ No files provided")
+        logger.warning("No files provided")
         raise HTTPException(
             status_code=400,
             detail="At least 1 Excel file is required"
@@ -51,7 +52,7 @@ async def xls_to_pdf_endpoint(
     
     # Validate all files are supported Excel formats
     for i, file in enumerate(files):
-        logger.info(f"📁 File {i+1}: {file.filename} ({file.content_type})")
+        logger.debug("File %d: %s (%s)", i + 1, file.filename, file.content_type)
         
         # Check MIME type or file extension
         is_valid = False
@@ -64,72 +65,51 @@ async def xls_to_pdf_endpoint(
                 is_valid = True
         
         if not is_valid:
-            logger.error(f"❌ Invalid file type: {file.content_type}")
+            logger.error("Invalid file type: %s", file.content_type)
             raise HTTPException(
                 status_code=400,
                 detail=f"File '{file.filename}' is not a supported Excel format. Supported formats: XLS, XLSX, XLSM."
             )
+        
+        # Size is known from the multipart parser, so empty files are rejected before any upload
+        if file.size == 0:
+            logger.error("Empty file: %s", file.filename)
+            raise HTTPException(
+                status_code=400,
+                detail=f"File '{file.filename}' is empty"
+            )
     
     try:
-        logger.info("🔧 Creating FileService instance...")
-        file_service = FileService()
-        uploaded_file_ids = []
+        # Upload all files to GridFS tmp_files bucket concurrently (different from user files)
+        result = await file_service.upload_temp_files(
+            files,
+            user_email=user.email,
+            user_id=str(user.id),
+            default_content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
         
-        # Upload each file to GridFS tmp_files bucket
-        for i, file in enumerate(files):
-            logger.info(f"📤 Uploading file {i+1}: {file.filename}")
-            
-            # Read file content
-            content = await file.read()
-            logger.info(f"📊 File size: {len(content)} bytes")
-            
-            if len(content) == 0:
-                logger.error(f"❌ Empty file: {file.filename}")
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File '{file.filename}' is empty"
-                )
-            
-            # Upload to tmp_files bucket (different from user files)
-            logger.info(f"🗃️ Calling upload_temp_file for {file.filename}")
-            result = await file_service.upload_temp_file(
-                file_content=content,
-                filename=file.filename,
-                content_type=file.content_type or 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                user_email=user.email,
-                user_id=str(user.id)
+        if not result.get("success"):
+            logger.error("Upload failed: %s", result)
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to upload files: {result.get('error')}"
             )
-            
-            logger.info(f"📋 Upload result: {result}")
-            
-            if not result.get("success"):
-                logger.error(f"❌ Upload failed: {result}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Failed to upload file '{file.filename}': {result.get('error')}"
-                )
-            
-            uploaded_file_ids.append(result["file_id"])
-            logger.info(f"✅ File uploaded with ID: {result['file_id']}")
         
-        # Create conversion command
-        logger.info(f"🚀 Creating Excel to PDF conversion command with file IDs: {uploaded_file_ids}")
-        command_id = await create_command(
-            shell_command="XlsToPdf",
-            args={
+        uploaded_file_ids = result["file_ids"]
+        
+        # Create conversion command and start processing it in the background
+        logger.debug("Creating Excel to PDF conversion command with file IDs: %s", uploaded_file_ids)
+        command_id = await submit_xls_to_pdf(
+            {
                 "file_ids": uploaded_file_ids,
                 "user_id": str(user.id),
                 "user_email": user.email
             }
         )
         
-        logger.info(f"✅ Command created with ID: {command_id}")
-        
-        # Start command processing asynchronously
-        logger.info("🔄 Starting async command processing...")
-        asyncio.create_task(process_command(command_id))
+        logger.debug("Command created with ID: %s", command_id)
         
-        logger.info("🎉 Excel to PDF conversion request completed successfully")
+        logger.info("Excel to PDF conversion command %s started for user %s", command_id, user.email)
         return {
             "success": True,
             "command_id": command_id,
@@ -141,10 +121,10 @@ async def xls_to_pdf_endpoint(
         }
         
     except HTTPException:
-        logger.error("❌ HTTP Exception occurred (re-raising)")
+        logger.error("HTTP exception occurred (re-raising)")
         raise
     except Exception as e:
-        logger.error(f"💥 Unexpected error: {str(e)}", exc_info=True)
+        logger.error("Unexpected error: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to process Excel to PDF conversion request: {str(e)}"
@@ -1,14 +1,24 @@
-import asyncio
 import logging
+import re
 from fastapi import APIRouter, Depends, HTTPException, Body
 from core.auth import User
 from core.auth import current_active_user
-from shell.command_manager import create_command, process_command
+from core.config import settings
+from shell.command_manager import HANDLERS, find_recent_command
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+submit_youtube_summary = HANDLERS["youtube_summary"]
+
+# Canonical YouTube URL forms; group 1 is the 11-character video ID
+_YT_RE = re.compile(
+    r"^(?:https?://)?(?:www\.|m\.)?"
+    r"(?:youtube\.com/watch\?(?:.*&)?v=|youtu\.be/|youtube\.com/shorts/)"
+    r"([A-Za-z0-9_-]{11})(?=[?&#/]|$)"
+)
+
 @router.post("/youtubeSummary")
 async def youtube_summary_endpoint(
     url: str = Body(..., embed=True),
@@ -17,27 +27,41 @@ async def youtube_summary_endpoint(
     """
     Submit a YouTube video URL and create a summary command
     Steps:
-    1. Validate URL
-    2. Create youtube_summary command with URL
-    3. Start command processing asynchronously
-    4. Return command ID for polling
+    1. Validate URL and extract the video ID
+    2. Reuse a recent command for the same video if one exists
+    3. Otherwise create youtube_summary command with the canonical URL
+    4. Start command processing asynchronously
+    5. Return command ID for polling
     """
     logger.info(f"\U0001F4FA Starting YouTube summary for user {user.email} with url {url}")
-    if not url or not url.startswith("http"):
+    match = _YT_RE.match(url.strip()) if url else None
+    if not match:
         logger.error(f"\u274c Invalid URL: {url}")
         raise HTTPException(
             status_code=400,
-            detail=f"URL '{url}' is not valid."
+            detail=f"URL '{url}' is not a valid YouTube video URL."
         )
+    video_id = match.group(1)
     try:
-        # create_command est async, donc il faut await
-        command_id = await create_command(
-            shell_command="youtube_summary",
-            args={"url": url, "user_id": str(user.id)}
+        # Summaries are stored as tmp files, so only reuse commands whose output is still kept
+        existing_command_id = await find_recent_command(
+            "youtube_summary",
+            {"args.video_id": video_id},
+            max_age_hours=settings.tmp_files_max_age_hours
+        )
+        if existing_command_id:
+            logger.info(f"\u267B\uFE0F Reusing command {existing_command_id} for video {video_id}")
+            return {"command_id": existing_command_id, "deduped": True}
+
+        # Create the command and start processing it asynchronously
+        command_id = await submit_youtube_summary(
+            {
+                "url": f"https://www.youtube.com/watch?v={video_id}",
+                "video_id": video_id,
+                "user_id": str(user.id)
+            }
         )
-        # Start processing asynchronously
-        asyncio.create_task(process_command(command_id))
-        return {"command_id": command_id}
+        return {"command_id": command_id, "deduped": False}
     except Exception as e:
         logger.error(f"\u274c Failed to create/process command: {e}")
-        raise HTTPException(status_code=500, detail="Failed to process YouTube summary command.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to process YouTube summary command.")
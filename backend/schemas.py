@@ -1,22 +1,20 @@
 from typing import Optional
 from fastapi_users import schemas
-from pydantic import EmailStr, field_validator
+from pydantic import EmailStr, field_serializer
 from beanie import PydanticObjectId
 
 
-class UserRead(schemas.BaseUser[str]):
+class UserRead(schemas.BaseUser[PydanticObjectId]):
     """Schema for reading user data"""
-    id: str
+    id: PydanticObjectId
     first_name: Optional[str] = None
     last_name: Optional[str] = None
     is_verified: bool = True
 
-    @field_validator('id', mode='before')
-    @classmethod
-    def convert_objectid_to_str(cls, v):
-        if isinstance(v, PydanticObjectId):
-            return str(v)
-        return v
+    @field_serializer('id')
+    def serialize_id(self, v: PydanticObjectId) -> str:
+        # Keep the ObjectId as is on validation, stringify only when dumping
+        return str(v)
 
 
 class UserCreate(schemas.BaseUserCreate):
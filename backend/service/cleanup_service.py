@@ -6,28 +6,91 @@ Handles both automatic batch cleanup and manual cleanup operations
 import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from typing import Dict, Any, List, Optional, Set
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from gridfs.errors import NoFile
 from bson import ObjectId
 from core.config import settings
+from core.database import get_client
 
 # Set up logging
 logger = logging.getLogger('cleanup_service')
 
+# Max ids per delete_many $in list (keeps the command well under the 16 MB BSON limit)
+DELETE_BATCH_SIZE = 1000
+
+# Max concurrent per-file GridFS deletes when falling back from a bulk delete
+GRIDFS_DELETE_CONCURRENCY = 32
+
+# Max old files handled by one scheduled cleanup run (the next run resumes from the oldest left)
+MAX_FILES_PER_RUN = 5000
+
+# Scheduler delay when the previous run hit MAX_FILES_PER_RUN, and cap of the idle backoff
+BACKLOG_RETRY_SECONDS = 60
+MAX_IDLE_BACKOFF_SECONDS = 6 * 3600
+
 class TmpFilesCleanupService:
     """Service for cleaning up temporary files from GridFS"""
     
     def __init__(self):
-        self.client = AsyncIOMotorClient(settings.mongodb_url)
+        # Share the process-wide client (and its connection pool) across instances
+        self.client = get_client()
         self.db = self.client[settings.database_name]
         self.tmp_bucket = AsyncIOMotorGridFSBucket(self.db, bucket_name="tmp_files")
+        self.tmp_files = self.db["tmp_files.files"]
+        self.tmp_chunks = self.db["tmp_files.chunks"]
+    
+    async def _delete_tmp_files(self, file_ids: List[ObjectId]) -> Dict[ObjectId, Exception]:
+        """
+        Delete tmp_files GridFS files in bulk, bypassing the per-file GridFS delete
+        
+        If the bulk delete fails, falls back to regular GridFS deletes run
+        concurrently (at most GRIDFS_DELETE_CONCURRENCY at a time).
+        
+        Args:
+            file_ids: GridFS file ids to delete (at most DELETE_BATCH_SIZE)
+            
+        Returns:
+            Dict mapping the ids that could not be deleted to their error
+        """
+        try:
+            await self.tmp_chunks.delete_many({"files_id": {"$in": file_ids}})
+            await self.tmp_files.delete_many({"_id": {"$in": file_ids}})
+            return {}
+        except Exception as e:
+            logger.warning(f"⚠️ Bulk delete of {len(file_ids)} tmp files failed ({e}), falling back to GridFS deletes")
+        
+        semaphore = asyncio.Semaphore(GRIDFS_DELETE_CONCURRENCY)
+        
+        async def _delete(file_id: ObjectId) -> None:
+            async with semaphore:
+                try:
+                    await self.tmp_bucket.delete(file_id)
+                except NoFile:
+                    pass  # Files document already removed by the partial bulk delete
+        
+        results = await asyncio.gather(*(_delete(file_id) for file_id in file_ids), return_exceptions=True)
+        return {
+            file_id: result
+            for file_id, result in zip(file_ids, results)
+            if isinstance(result, Exception)
+        }
     
-    async def cleanup_old_files(self, max_age_hours: int = 24) -> Dict[str, Any]:
+    async def cleanup_old_files(
+        self,
+        max_age_hours: int = 24,
+        detail: bool = False,
+        limit: Optional[int] = None,
+        already_deleted: Optional[Set[ObjectId]] = None
+    ) -> Dict[str, Any]:
         """
         Remove temporary files older than max_age_hours
         
         Args:
             max_age_hours: Files older than this will be deleted (default: 24 hours)
+            detail: Also return the list of deleted files (default: counts only)
+            limit: Maximum number of files to process in this call (default: no limit)
+            already_deleted: Ids handled by another cleanup in the same run; skipped here, and updated with this call's ids
             
         Returns:
             Dict with cleanup statistics
@@ -39,37 +102,68 @@ class TmpFilesCleanupService:
         total_size_freed = 0
         deleted_files = []
         errors = []
+        limit_reached = False
+        scanned_count = 0
+        if already_deleted is None:
+            already_deleted = set()
         
         try:
-            # Find old files
-            cursor = self.tmp_bucket.find({"uploadDate": {"$lt": cutoff_date}})
+            # Find old files oldest first (only the fields needed for reporting);
+            # the sort is served by the uploadDate index, no in-memory sort
+            cursor = self.tmp_files.find(
+                {"uploadDate": {"$lt": cutoff_date}},
+                {"_id": 1, "length": 1, "filename": 1, "uploadDate": 1}
+            ).sort("uploadDate", 1).batch_size(DELETE_BATCH_SIZE)
+            if limit:
+                cursor = cursor.limit(limit)
             
-            async for file_doc in cursor:
-                try:
-                    file_info = {
-                        "id": str(file_doc._id),
-                        "filename": file_doc.filename,
-                        "size": file_doc.length,
-                        "upload_date": file_doc.upload_date.isoformat()
-                    }
+            # Fetch a page per round-trip and delete it with one delete_many per collection
+            while batch := await cursor.to_list(DELETE_BATCH_SIZE):
+                scanned_count += len(batch)
+                
+                # Claim the ids before awaiting so a concurrent cleanup skips them
+                batch = [file_doc for file_doc in batch if file_doc["_id"] not in already_deleted]
+                if not batch:
+                    continue
+                already_deleted.update(file_doc["_id"] for file_doc in batch)
+                
+                failed = await self._delete_tmp_files([file_doc["_id"] for file_doc in batch])
+                
+                if not failed and not detail and not logger.isEnabledFor(logging.DEBUG):
+                    # Nothing to report per file: just tally the batch
+                    deleted_count += len(batch)
+                    total_size_freed += sum(file_doc["length"] for file_doc in batch)
+                    continue
+                
+                for file_doc in batch:
+                    # Projected fields, read once per file
+                    file_id = file_doc["_id"]
+                    filename = file_doc["filename"]
+                    size = file_doc["length"]
                     
-                    # Delete the file
-                    await self.tmp_bucket.delete(file_doc._id)
+                    error = failed.get(file_id)
+                    if error is not None:
+                        errors.append({
+                            "file_id": str(file_id),
+                            "filename": filename,
+                            "error": str(error)
+                        })
+                        logger.error(f"❌ Failed to delete {file_id}: {error}")
+                        continue
                     
                     deleted_count += 1
-                    total_size_freed += file_doc.length
-                    deleted_files.append(file_info)
+                    total_size_freed += size
+                    if detail:
+                        deleted_files.append({
+                            "id": str(file_id),
+                            "filename": filename,
+                            "size": size,
+                            "upload_date": file_doc["uploadDate"].isoformat()
+                        })
                     
-                    logger.info(f"🗑️ Deleted tmp file: {file_doc.filename} (ID: {file_doc._id}, Size: {file_doc.length} bytes)")
-                    
-                except Exception as e:
-                    error_info = {
-                        "file_id": str(file_doc._id),
-                        "filename": getattr(file_doc, 'filename', 'unknown'),
-                        "error": str(e)
-                    }
-                    errors.append(error_info)
-                    logger.error(f"❌ Failed to delete {file_doc._id}: {e}")
+                    logger.debug("🗑️ Deleted tmp file: %s (ID: %s, Size: %s bytes)", filename, file_id, size)
+            
+            limit_reached = bool(limit) and scanned_count >= limit
             
             # Log summary
             size_mb = total_size_freed / (1024 * 1024)
@@ -82,7 +176,8 @@ class TmpFilesCleanupService:
                 "total_size_freed_mb": round(size_mb, 2),
                 "cutoff_date": cutoff_date.isoformat(),
                 "deleted_files": deleted_files,
-                "errors": errors
+                "errors": errors,
+                "limit_reached": limit_reached
             }
             
         except Exception as e:
@@ -94,13 +189,17 @@ class TmpFilesCleanupService:
                 "total_size_freed_bytes": total_size_freed
             }
     
-    async def cleanup_by_command_status(self) -> Dict[str, Any]:
+    async def cleanup_by_command_status(self, detail: bool = False, already_deleted: Optional[Set[ObjectId]] = None) -> Dict[str, Any]:
         """
         Remove temporary files for completed/failed commands older than 1 hour
         
         This is more intelligent cleanup that looks at command status rather than just file age.
         Files are only deleted if their associated command is completed and old enough.
         
+        Args:
+            detail: Also return the processed commands and their deleted files (default: counts only)
+            already_deleted: Ids handled by another cleanup in the same run; skipped here, and updated with this call's ids
+        
         Returns:
             Dict with cleanup statistics
         """
@@ -110,90 +209,109 @@ class TmpFilesCleanupService:
         deleted_count = 0
         total_size_freed = 0
         processed_commands = []
+        processed_command_ids = set()
         errors = []
+        if already_deleted is None:
+            already_deleted = set()
         
         try:
-            # Find completed commands older than 1 hour
-            command_cursor = self.db.commands.find({
-                "exit_state": {"$ne": -1},  # Not running (-1 = not started)
-                "completed_at": {"$lt": cutoff_date}
-            })
+            # Join completed commands older than 1 hour with their existing input files
+            # server-side: one row per (command, file) with everything needed for deletion
+            pipeline = [
+                {"$match": {
+                    "exit_state": {"$gt": -1},  # Not running (-1 = not started); range keeps the index usable
+                    "completed_at": {"$lt": cutoff_date}
+                }},
+                {"$project": {
+                    "shell_command": 1,
+                    "exit_state": 1,
+                    "completed_at": 1,
+                    "file_ids": "$args.file_ids",
+                    "fid": "$args.file_ids"
+                }},
+                {"$unwind": "$fid"},
+                {"$addFields": {
+                    # Invalid ids become null and simply match no file
+                    "fid_obj": {"$convert": {"input": "$fid", "to": "objectId", "onError": None, "onNull": None}}
+                }},
+                {"$lookup": {
+                    "from": "tmp_files.files",
+                    "localField": "fid_obj",
+                    "foreignField": "_id",
+                    "as": "f"
+                }},
+                {"$unwind": "$f"},
+                {"$project": {
+                    "_id": 0,
+                    "command_id": {"$toString": "$_id"},
+                    "shell_command": 1,
+                    "exit_state": 1,
+                    "completed_at": 1,
+                    "file_ids": 1,
+                    "file_id": "$f._id",
+                    "size": "$f.length",
+                    "filename": "$f.filename"
+                }}
+            ]
             
-            async for command in command_cursor:
-                command_id = str(command["_id"])
-                try:
-                    # Get input files from command args
-                    file_ids = command.get("args", {}).get("file_ids", [])
-                    
-                    if not file_ids:
-                        continue  # No files to clean up
-                    
-                    command_info = {
+            command_infos = {}
+            files = {}  # file ObjectId -> row, a file shared by several commands is deleted once
+            async for row in self.db.commands.aggregate(pipeline):
+                command_id = row["command_id"]
+                if detail and command_id not in command_infos:
+                    command_infos[command_id] = {
                         "command_id": command_id,
-                        "shell_command": command.get("shell_command"),
-                        "exit_state": command.get("exit_state"),
-                        "completed_at": command.get("completed_at"),
-                        "file_ids": file_ids,
+                        "shell_command": row.get("shell_command"),
+                        "exit_state": row.get("exit_state"),
+                        "completed_at": row.get("completed_at"),
+                        "file_ids": row.get("file_ids", []),
                         "deleted_files": []
                     }
+                files.setdefault(row["file_id"], row)
+            
+            # Claim the ids before awaiting so a concurrent cleanup skips them
+            all_ids = [file_obj_id for file_obj_id in files if file_obj_id not in already_deleted]
+            already_deleted.update(all_ids)
+            for i in range(0, len(all_ids), DELETE_BATCH_SIZE):
+                batch_ids = all_ids[i:i + DELETE_BATCH_SIZE]
+                failed = await self._delete_tmp_files(batch_ids)
+                
+                # Attribute deleted files to their command
+                for file_obj_id in batch_ids:
+                    row = files[file_obj_id]
+                    command_id = row["command_id"]
+                    if file_obj_id in failed:
+                        errors.append({
+                            "command_id": command_id,
+                            "file_id": str(file_obj_id),
+                            "error": str(failed[file_obj_id])
+                        })
+                        logger.error(f"❌ Failed to delete file {file_obj_id} for command {command_id}: {failed[file_obj_id]}")
+                        continue
                     
-                    # Delete each input file
-                    for file_id_str in file_ids:
-                        try:
-                            file_obj_id = ObjectId(file_id_str)
-                            
-                            # Get file info before deleting
-                            file_cursor = self.tmp_bucket.find({"_id": file_obj_id})
-                            try:
-                                file_doc = await file_cursor.next()
-                                file_size = file_doc.length
-                                filename = file_doc.filename
-                                
-                                # Delete the file
-                                await self.tmp_bucket.delete(file_obj_id)
-                                
-                                deleted_count += 1
-                                total_size_freed += file_size
-                                command_info["deleted_files"].append({
-                                    "file_id": file_id_str,
-                                    "filename": filename,
-                                    "size": file_size
-                                })
-                                
-                                logger.info(f"🗑️ Deleted input file {filename} for command {command_id}")
-                                
-                            except StopAsyncIteration:
-                                # File already deleted or doesn't exist
-                                logger.warning(f"File {file_id_str} not found (already deleted?)")
-                                
-                        except Exception as e:
-                            error_info = {
-                                "command_id": command_id,
-                                "file_id": file_id_str,
-                                "error": str(e)
-                            }
-                            errors.append(error_info)
-                            logger.error(f"❌ Failed to delete file {file_id_str} for command {command_id}: {e}")
+                    deleted_count += 1
+                    total_size_freed += row["size"]
+                    processed_command_ids.add(command_id)
+                    if detail:
+                        command_infos[command_id]["deleted_files"].append({
+                            "file_id": str(file_obj_id),
+                            "filename": row["filename"],
+                            "size": row["size"]
+                        })
                     
-                    if command_info["deleted_files"]:
-                        processed_commands.append(command_info)
-                        
-                except Exception as e:
-                    error_info = {
-                        "command_id": command_id,
-                        "error": str(e)
-                    }
-                    errors.append(error_info)
-                    logger.error(f"❌ Failed to process command {command_id}: {e}")
+                    logger.debug("🗑️ Deleted input file %s for command %s", row["filename"], command_id)
+            
+            if detail:
+                processed_commands = [info for info in command_infos.values() if info["deleted_files"]]
             
             # Log summary
             size_mb = total_size_freed / (1024 * 1024)
-            logger.info(f"✅ Command-based cleanup completed: {deleted_count} files removed from {len(processed_commands)} commands, {size_mb:.2f} MB freed")
+            logger.info(f"✅ Command-based cleanup completed: {deleted_count} files removed from {len(processed_command_ids)} commands, {size_mb:.2f} MB freed")
             
             return {
                 "success": True,
                 "deleted_count": deleted_count,
-                "processed_commands_count": len(processed_commands),
+                "processed_commands_count": len(processed_command_ids),
                 "total_size_freed_bytes": total_size_freed,
                 "total_size_freed_mb": round(size_mb, 2),
                 "cutoff_date": cutoff_date.isoformat(),
@@ -207,7 +325,7 @@ class TmpFilesCleanupService:
                 "success": False,
                 "error": str(e),
                 "deleted_count": deleted_count,
-                "processed_commands_count": len(processed_commands),
+                "processed_commands_count": len(processed_command_ids),
                 "total_size_freed_bytes": total_size_freed
             }
     
@@ -219,36 +337,39 @@ class TmpFilesCleanupService:
             Dict with tmp_files statistics
         """
         try:
-            # Count all files
-            total_files = 0
-            total_size = 0
-            files_by_age = {
-                "last_hour": 0,
-                "last_day": 0,
-                "last_week": 0,
-                "older": 0
-            }
-            
             now = datetime.utcnow()
             one_hour_ago = now - timedelta(hours=1)
             one_day_ago = now - timedelta(days=1)
             one_week_ago = now - timedelta(weeks=1)
             
-            cursor = self.tmp_bucket.find({})
+            def _count_between(newer_than, older_or_equal=None):
+                """$sum expression counting files with newer_than < uploadDate <= older_or_equal"""
+                condition = {"$gt": ["$uploadDate", newer_than]}
+                if older_or_equal is not None:
+                    condition = {"$and": [condition, {"$lte": ["$uploadDate", older_or_equal]}]}
+                return {"$sum": {"$cond": [condition, 1, 0]}}
             
-            async for file_doc in cursor:
-                total_files += 1
-                total_size += file_doc.length
-                
-                upload_date = file_doc.upload_date
-                if upload_date > one_hour_ago:
-                    files_by_age["last_hour"] += 1
-                elif upload_date > one_day_ago:
-                    files_by_age["last_day"] += 1
-                elif upload_date > one_week_ago:
-                    files_by_age["last_week"] += 1
-                else:
-                    files_by_age["older"] += 1
+            # Count and bucket all files server-side in a single pass
+            cursor = self.tmp_files.aggregate([
+                {"$group": {
+                    "_id": None,
+                    "total_files": {"$sum": 1},
+                    "total_size": {"$sum": "$length"},
+                    "last_hour": _count_between(one_hour_ago),
+                    "last_day": _count_between(one_day_ago, one_hour_ago),
+                    "last_week": _count_between(one_week_ago, one_day_ago),
+                    "older": {"$sum": {"$cond": [{"$lte": ["$uploadDate", one_week_ago]}, 1, 0]}}
+                }}
+            ])
+            stats = await cursor.to_list(1)
+            stats = stats[0] if stats else {}
+            
+            total_files = stats.get("total_files", 0)
+            total_size = stats.get("total_size", 0)
+            files_by_age = {
+                bucket: stats.get(bucket, 0)
+                for bucket in ("last_hour", "last_day", "last_week", "older")
+            }
             
             return {
                 "success": True,
@@ -266,21 +387,27 @@ class TmpFilesCleanupService:
                 "error": str(e)
             }
     
-    async def full_cleanup(self, max_age_hours: int = 24) -> Dict[str, Any]:
+    async def full_cleanup(self, max_age_hours: int = 24, detail: bool = False, limit: Optional[int] = None) -> Dict[str, Any]:
         """
         Run both time-based and command-based cleanup
         
         Args:
             max_age_hours: Maximum age for files in hours
+            detail: Forwarded to both cleanups to include per-file results
+            limit: Maximum number of old files handled by the time-based cleanup
             
         Returns:
             Combined cleanup results
         """
         logger.info(f"🚀 Starting full cleanup process...")
         
-        # Run both cleanup methods
-        time_based_result = await self.cleanup_old_files(max_age_hours)
-        command_based_result = await self.cleanup_by_command_status()
+        # Run both cleanup methods concurrently (independent queries, overlapping round-trips),
+        # sharing the ids already handled so a file matched by both is deleted only once
+        already_deleted = set()
+        time_based_result, command_based_result = await asyncio.gather(
+            self.cleanup_old_files(max_age_hours, detail=detail, limit=limit, already_deleted=already_deleted),
+            self.cleanup_by_command_status(detail=detail, already_deleted=already_deleted)
+        )
         
         # Combine results
         total_deleted = time_based_result.get("deleted_count", 0) + command_based_result.get("deleted_count", 0)
@@ -292,30 +419,33 @@ class TmpFilesCleanupService:
             "total_deleted_files": total_deleted,
             "total_size_freed_bytes": total_size_freed,
             "total_size_freed_mb": round(total_size_freed / (1024 * 1024), 2),
+            "limit_reached": time_based_result.get("limit_reached", False),
             "time_based_cleanup": time_based_result,
             "command_based_cleanup": command_based_result,
             "timestamp": datetime.utcnow().isoformat()
         }
 
 
-async def run_single_cleanup():
+async def run_single_cleanup() -> Optional[Dict[str, Any]]:
     """
-    Run cleanup once and return
+    Run cleanup once and return its result (None if it crashed)
     """
     cleanup_service = TmpFilesCleanupService()
     max_age_hours = getattr(settings, 'tmp_files_max_age_hours', 24)
     
     try:
         logger.info("⏰ Running scheduled cleanup...")
-        result = await cleanup_service.full_cleanup(max_age_hours=max_age_hours)
+        result = await cleanup_service.full_cleanup(max_age_hours=max_age_hours, detail=False, limit=MAX_FILES_PER_RUN)
         
         if result["success"]:
             logger.info(f"✅ Scheduled cleanup completed: {result['total_deleted_files']} files, {result['total_size_freed_mb']} MB freed")
         else:
             logger.error(f"❌ Scheduled cleanup failed: {result.get('error', 'Unknown error')}")
+        return result
             
     except Exception as e:
         logger.error(f"❌ Critical error in cleanup: {e}")
+        return None
 
 def start_cleanup_scheduler():
     """
@@ -332,13 +462,30 @@ def start_cleanup_scheduler():
         # Wait a bit before starting (let the app fully initialize)
         await asyncio.sleep(60)  # Wait 1 minute after startup
         
+        base_delay = cleanup_interval_minutes * 60  # Convert minutes to seconds
+        idle_runs = 0
+        
         while True:
             try:
                 # Run a single cleanup
-                await run_single_cleanup()
+                result = await run_single_cleanup()
+                
+                # Pick the next delay from what this run did
+                if result and result.get("limit_reached"):
+                    # Backlog left over: come back soon
+                    idle_runs = 0
+                    delay = BACKLOG_RETRY_SECONDS
+                elif result and result.get("total_deleted_files", 0) == 0:
+                    # Nothing to do: back off exponentially up to the cap
+                    delay = min(base_delay * 2 ** idle_runs, MAX_IDLE_BACKOFF_SECONDS)
+                    if delay < MAX_IDLE_BACKOFF_SECONDS:
+                        idle_runs += 1
+                else:
+                    idle_runs = 0
+                    delay = base_delay
                 
                 # Wait for next cleanup
-                await asyncio.sleep(cleanup_interval_minutes * 60)  # Convert minutes to seconds
+                await asyncio.sleep(delay)
                 
             except asyncio.CancelledError:
                 logger.info("🛑 Cleanup scheduler cancelled")
@@ -3,41 +3,89 @@ File service for handling image uploads/downloads using GridFS
 """
 from motor.motor_asyncio import AsyncIOMotorGridFSBucket
 from gridfs.errors import NoFile
-from core.database import get_images_bucket
-from typing import List, Dict, Any, Optional
-import datetime
+from core.config import settings
+from core.database import get_database, get_images_bucket
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+from functools import cached_property
 from bson import ObjectId
-import io
+
+# GridFS default chunk size; uploads are streamed in blocks of this size
+GRIDFS_CHUNK_SIZE = 255 * 1024
+
+# Bounds concurrent GridFS transfers (upload streams, download chunk reads) so they
+# apply backpressure instead of exhausting the motor connection pool
+_transfer_semaphore = asyncio.Semaphore(settings.gridfs_max_concurrency)
+
+# Fields of a files document needed to build file info (see _doc_to_info)
+FILE_INFO_PROJECTION = {"metadata": 1, "filename": 1, "length": 1, "uploadDate": 1}
+
+# Page size of list_user_files when none is given, and the largest page it returns
+DEFAULT_FILE_PAGE_SIZE = 100
+MAX_FILE_PAGE_SIZE = 1000
 
 class FileService:
-    def __init__(self):
-        """Initialize FileService with the images bucket"""
-        self._bucket = None
-        self._tmp_bucket = None
+    """
+    GridFS file operations for user files (images bucket) and temporary files (tmp_files bucket)
     
-    async def _get_bucket(self) -> AsyncIOMotorGridFSBucket:
-        """Get the GridFS bucket (lazy initialization)"""
-        if self._bucket is None:
-            self._bucket = get_images_bucket()
-        return self._bucket
+    Database handles are resolved once, on first use (after init_db), and cached on the instance.
+    """
     
-    async def _get_tmp_bucket(self) -> AsyncIOMotorGridFSBucket:
-        """Get the temporary files GridFS bucket (lazy initialization)"""
-        if self._tmp_bucket is None:
-            from core.database import get_database
-            db = get_database()
-            self._tmp_bucket = AsyncIOMotorGridFSBucket(db, bucket_name="tmp_files")
-        return self._tmp_bucket
-
-    async def upload_file(self, file_content: bytes, filename: str, content_type: str, 
-                         user_email: str, user_id: str) -> Dict[str, Any]:
+    @cached_property
+    def _db(self):
+        """Database instance"""
+        return get_database()
+    
+    @cached_property
+    def _bucket(self) -> AsyncIOMotorGridFSBucket:
+        """User files GridFS bucket"""
+        return get_images_bucket()
+    
+    @cached_property
+    def _files_coll(self):
+        """Files collection of the user files bucket"""
+        return self._db["images.files"]
+    
+    @cached_property
+    def _chunks_coll(self):
+        """Chunks collection of the user files bucket"""
+        return self._db["images.chunks"]
+    
+    @cached_property
+    def _tmp_bucket(self) -> AsyncIOMotorGridFSBucket:
+        """Temporary files GridFS bucket"""
+        return AsyncIOMotorGridFSBucket(self._db, bucket_name="tmp_files")
+    
+    async def _find_owned_file(self, file_id: ObjectId, user_email: str) -> Optional[Dict[str, Any]]:
+        """Fetch a file document only if it exists and is owned by user_email"""
+        return await self._files_coll.find_one(
+            {"_id": file_id, "metadata.owner_email": user_email},
+            FILE_INFO_PROJECTION
+        )
+    
+    def _doc_to_info(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the file information dict returned to users from a files document"""
+        metadata = doc.get("metadata") or {}
+        upload_date = doc["uploadDate"]
+        return {
+            "id": str(doc["_id"]),
+            "name": metadata.get("display_name", doc["filename"]),  # Always show display name to user
+            "original_name": doc["filename"],  # Keep original for reference
+            "size_bytes": doc["length"],
+            "content_type": metadata.get("content_type", "unknown"),
+            "uploaded": f"{upload_date.year:04d}-{upload_date.month:02d}-{upload_date.day:02d}",  # Avoids strftime's locale machinery
+            "upload_datetime": upload_date.isoformat(),
+            "owner": metadata.get("owner_email")
+        }
+    
+    async def upload_file(self, file: Any, user_email: str, user_id: str) -> Dict[str, Any]:
         """
-        Upload a file to GridFS
+        Upload a file to GridFS, streaming it block by block
         
         Args:
-            file_content: The file content as bytes
-            filename: Original filename
-            content_type: MIME type of the file
+            file: Uploaded file (FastAPI UploadFile) exposing async read()
             user_email: Email of the user uploading
             user_id: ID of the user uploading
             
@@ -45,32 +93,27 @@ class FileService:
             Dict with file info and upload result
         """
         try:
-            bucket = await self._get_bucket()
+            bucket = self._bucket
             
             # Create metadata
             metadata = {
                 "owner_email": user_email,
                 "owner_id": user_id,
-                "original_filename": filename,
-                "display_name": filename,
-                "content_type": content_type,
-                "upload_date": datetime.datetime.utcnow(),
-                "file_size": len(file_content)
+                "original_filename": file.filename,
+                "display_name": file.filename,
+                "content_type": file.content_type,
+                "upload_date": datetime.now(timezone.utc),
+                "file_size": file.size
             }
             
-            # Upload to GridFS should be closed after use
-            file_id = await bucket.upload_from_stream(
-                filename=filename,
-                source=io.BytesIO(file_content),
-                metadata=metadata
-            )
+            file_id, size = await self._upload_stream(bucket, file, metadata, hash_content=True)
             
             return {
                 "success": True,
                 "file_id": str(file_id),
-                "filename": filename,
-                "size": len(file_content),
-                "content_type": content_type,
+                "filename": file.filename,
+                "size": size,
+                "content_type": file.content_type,
                 "owner": user_email,
                 "upload_date": metadata["upload_date"].isoformat()
             }
@@ -81,15 +124,12 @@ class FileService:
                 "error": f"Upload failed: {str(e)}"
             }
     
-    async def upload_temp_file(self, file_content: bytes, filename: str, content_type: str, 
-                              user_email: str, user_id: str) -> Dict[str, Any]:
+    async def upload_temp_file(self, file: Any, user_email: str, user_id: str) -> Dict[str, Any]:
         """
-        Upload a temporary file to GridFS tmp_files bucket
+        Upload a temporary file to GridFS tmp_files bucket, streaming it block by block
         
         Args:
-            file_content: The file content as bytes
-            filename: Original filename
-            content_type: MIME type of the file
+            file: Uploaded file (FastAPI UploadFile) exposing async read()
             user_email: Email of the user uploading
             user_id: ID of the user uploading
             
@@ -97,33 +137,27 @@ class FileService:
             Dict with file info and upload result
         """
         try:
-            bucket = await self._get_tmp_bucket()
+            bucket = self._tmp_bucket
             
             # Create metadata for temporary file
             metadata = {
                 "owner_email": user_email,
                 "owner_id": user_id,
-                "original_filename": filename,
-                "content_type": content_type,
-                "upload_date": datetime.datetime.utcnow(),
-                "file_size": len(file_content),
+                "original_filename": file.filename,
+                "content_type": file.content_type,
+                "upload_date": datetime.now(timezone.utc),
+                "file_size": file.size,
                 "is_temporary": True
             }
             
-            # Upload file to tmp_files bucket
-            file_stream = io.BytesIO(file_content)
-            file_id = await bucket.upload_from_stream(
-                filename,
-                file_stream,
-                metadata=metadata
-            )
+            file_id, size = await self._upload_stream(bucket, file, metadata)
             
             return {
                 "success": True,
                 "file_id": str(file_id),
-                "filename": filename,
-                "size": len(file_content),
-                "content_type": content_type,
+                "filename": file.filename,
+                "size": size,
+                "content_type": file.content_type,
                 "bucket": "tmp_files"
             }
             
@@ -132,46 +166,176 @@ class FileService:
                 "success": False,
                 "error": f"Failed to upload temporary file: {str(e)}"
             }
+    
+    async def _upload_stream(self, bucket: AsyncIOMotorGridFSBucket, file: Any,
+                             metadata: Dict[str, Any], hash_content: bool = False) -> Tuple[ObjectId, int]:
+        """
+        Stream one uploaded file into a new GridFS file, aborting it on failure
+        
+        With hash_content, the SHA-256 of the content is computed while streaming
+        and stored as metadata.sha256.
+        """
+        grid_in = bucket.open_upload_stream(
+            file.filename,
+            chunk_size_bytes=GRIDFS_CHUNK_SIZE,
+            metadata=metadata
+        )
+        hasher = hashlib.sha256() if hash_content else None
+        try:
+            size = await self._write_stream(grid_in, file, hasher)
+            if hasher is not None:
+                # Set before close so it is part of the files document written on close
+                await grid_in.set("metadata", {**metadata, "sha256": hasher.hexdigest()})
+            await grid_in.close()
+        except Exception:
+            await grid_in.abort()
+            raise
+        return grid_in._id, size
+
+    async def upload_temp_files(self, files: List[Any], user_email: str, user_id: str,
+                                default_content_type: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Upload several files to GridFS tmp_files bucket concurrently
+        
+        Each file is streamed into its own GridFS upload stream in chunk-sized
+        blocks. If any upload fails, the others stop at their next block and,
+        once no write is in flight, every stream is aborted so no orphan
+        chunks are left behind.
+        
+        Args:
+            files: Uploaded files (FastAPI UploadFile) exposing async read()
+            user_email: Email of the user uploading
+            user_id: ID of the user uploading
+            default_content_type: MIME type used when a file has none
+            
+        Returns:
+            Dict with the uploaded file IDs (same order as files)
+        """
+        bucket = self._tmp_bucket
+        upload_date = datetime.now(timezone.utc)
+        grid_ins = []
+        
+        try:
+            for file in files:
+                content_type = file.content_type or default_content_type
+                grid_ins.append(bucket.open_upload_stream(
+                    file.filename,
+                    chunk_size_bytes=GRIDFS_CHUNK_SIZE,
+                    metadata={
+                        "owner_email": user_email,
+                        "owner_id": user_id,
+                        "original_filename": file.filename,
+                        "content_type": content_type,
+                        "upload_date": upload_date,
+                        "file_size": file.size,
+                        "is_temporary": True
+                    }
+                ))
+            
+            # Motor runs writes in executor threads, which cancelling a task doesn't stop:
+            # rather than cancelling, a failed upload tells the others to stop and all of
+            # them are awaited before anything is aborted
+            stop = asyncio.Event()
+            
+            async def _write(grid_in, file) -> int:
+                try:
+                    return await self._write_stream(grid_in, file, stop=stop)
+                except Exception:
+                    stop.set()
+                    raise
+            
+            results = await asyncio.gather(
+                *(_write(grid_in, file) for grid_in, file in zip(grid_ins, files)),
+                return_exceptions=True
+            )
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if not errors:
+                closed = await asyncio.gather(*(grid_in.close() for grid_in in grid_ins), return_exceptions=True)
+                errors = [result for result in closed if isinstance(result, BaseException)]
+            if errors:
+                raise errors[0]
+            
+            return {
+                "success": True,
+                "file_ids": [str(grid_in._id) for grid_in in grid_ins],
+                "bucket": "tmp_files"
+            }
+            
+        except Exception as e:
+            await asyncio.gather(*(grid_in.abort() for grid_in in grid_ins), return_exceptions=True)
+            return {
+                "success": False,
+                "error": f"Failed to upload temporary files: {str(e)}"
+            }
+    
+    async def _write_stream(self, grid_in, file, hasher=None, stop: Optional[asyncio.Event] = None) -> int:
+        """
+        Copy an uploaded file into a GridFS upload stream block by block, returning its size
+        
+        The stream is left open for the caller to close. If a hasher is given it is
+        fed each block in a worker thread (hashlib releases the GIL) so hashing
+        large uploads doesn't block the event loop. Once stop is set, no further
+        block is written.
+        """
+        size = 0
+        async with _transfer_semaphore:
+            while stop is None or not stop.is_set():
+                chunk = await file.read(GRIDFS_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if hasher is not None:
+                    await asyncio.to_thread(hasher.update, chunk)
+                await grid_in.write(chunk)
+        return size
 
-    async def list_user_files(self, user_email: str, user_id: str) -> List[Dict[str, Any]]:
+    async def list_user_files(self, user_email: str, user_id: str,
+                              limit: int = DEFAULT_FILE_PAGE_SIZE, offset: int = 0) -> List[Dict[str, Any]]:
         """
-        List all files for a specific user
+        List files for a specific user, newest first
         
         Args:
             user_email: User's email
             user_id: User's ID
+            limit: Maximum number of files to return (capped at MAX_FILE_PAGE_SIZE)
+            offset: Number of files to skip (for pagination)
             
         Returns:
             List of file information dictionaries
         """
         try:
-            bucket = await self._get_bucket()
-            files = []
-            
-            # Query files by owner
-            cursor = bucket.find({"metadata.owner_email": user_email})
-            
-            async for file_doc in cursor:
-                # Use display_name if available, fallback to original filename
-                display_name = file_doc.metadata.get("display_name", file_doc.filename)
-                files.append({
-                    "id": str(file_doc._id),
-                    "name": display_name,  # Always show display name to user
-                    "original_name": file_doc.filename,  # Keep original for reference
-                    "size": self._format_file_size(file_doc.length),
-                    "size_bytes": file_doc.length,
-                    "content_type": file_doc.metadata.get("content_type", "unknown"),
-                    "uploaded": file_doc.upload_date.strftime("%Y-%m-%d"),
-                    "upload_datetime": file_doc.upload_date.isoformat(),
-                    "owner": file_doc.metadata.get("owner_email", user_email)
-                })
-            
-            return files
+            limit = max(1, min(limit, MAX_FILE_PAGE_SIZE))
+            
+            # Query files by owner, served by the (owner_email, uploadDate) index
+            cursor = self._files_coll.find(
+                {"metadata.owner_email": user_email},
+                FILE_INFO_PROJECTION
+            ).sort("uploadDate", -1).skip(offset).limit(limit)
+            
+            file_docs = await cursor.to_list(length=limit)
+            return [self._doc_to_info(file_doc) for file_doc in file_docs]
             
         except Exception as e:
             print(f"Error listing files for user {user_email}: {e}")
             return []
     
+    async def list_user_file_ids(self, user_email: str, user_id: str) -> List[ObjectId]:
+        """
+        List the ids of all files owned by a user, without fetching any metadata
+        
+        Args:
+            user_email: User's email
+            user_id: User's ID
+            
+        Returns:
+            List of GridFS file IDs
+        """
+        file_docs = await self._files_coll.find(
+            {"metadata.owner_email": user_email},
+            {"_id": 1}
+        ).to_list(length=None)
+        return [file_doc["_id"] for file_doc in file_docs]
+    
     async def delete_file(self, file_id: str, user_email: str, user_id: str) -> Dict[str, Any]:
         """
         Delete a file from GridFS (only if owned by user)
@@ -185,24 +349,25 @@ class FileService:
             Dict with deletion result
         """
         try:
-            bucket = await self._get_bucket()
+            file_id_obj = ObjectId(file_id)
             
             # First verify the file exists and is owned by the user
-            file_info = await self.get_file_info(file_id, user_email, user_id)
-            if not file_info:
+            file_doc = await self._find_owned_file(file_id_obj, user_email)
+            if not file_doc:
                 return {
                     "success": False,
                     "error": "File not found or access denied"
                 }
+            display_name = (file_doc.get("metadata") or {}).get("display_name", file_doc["filename"])
             
             # Delete the file
-            await bucket.delete(ObjectId(file_id))
+            await self._bucket.delete(file_id_obj)
             
             return {
                 "success": True,
-                "message": f"File '{file_info['name']}' deleted successfully",
+                "message": f"File '{display_name}' deleted successfully",
                 "deleted_file_id": file_id,
-                "deleted_filename": file_info['name']
+                "deleted_filename": display_name
             }
             
         except NoFile:
@@ -216,6 +381,42 @@ class FileService:
                 "error": f"Delete failed: {str(e)}"
             }
     
+    async def bulk_delete_files(self, file_ids: List[ObjectId], user_email: str, user_id: str) -> Dict[str, Any]:
+        """
+        Delete many files owned by a user with one query per GridFS collection
+        
+        Ids not owned by the user are ignored. Chunks are removed before their
+        files documents, so a failure never leaves a listed file without content.
+        
+        Args:
+            file_ids: GridFS file IDs to delete
+            user_email: User's email (for ownership verification)
+            user_id: User's ID (for ownership verification)
+            
+        Returns:
+            Dict with deletion result and deleted_count
+        """
+        try:
+            # Keep only the ids owned by the user before touching any chunks
+            owned_docs = await self._files_coll.find(
+                {"_id": {"$in": file_ids}, "metadata.owner_email": user_email},
+                {"_id": 1}
+            ).to_list(length=None)
+            owned_ids = [doc["_id"] for doc in owned_docs]
+            if not owned_ids:
+                return {"success": True, "deleted_count": 0}
+            
+            await self._chunks_coll.delete_many({"files_id": {"$in": owned_ids}})
+            result = await self._files_coll.delete_many({"_id": {"$in": owned_ids}})
+            
+            return {"success": True, "deleted_count": result.deleted_count}
+            
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Bulk delete failed: {str(e)}"
+            }
+    
     async def download_file(self, file_id: str, user_email: str, user_id: str) -> Optional[Dict[str, Any]]:
         """
         Download a file from GridFS (only if owned by user)
@@ -226,44 +427,45 @@ class FileService:
             user_id: User's ID (for ownership verification)
             
         Returns:
-            Dict with file content and metadata, or None if not found/no access
+            Dict with a chunk stream of the file content and metadata, or None if not found/no access
         """
         try:
-            bucket = await self._get_bucket()
+            bucket = self._bucket
             
-            # First get file info to verify ownership
-            cursor = bucket.find({"_id": ObjectId(file_id)})
-            file_doc = await cursor.next()
-            if not file_doc:
-                return None
-                
-            if file_doc.metadata.get("owner_email") != user_email:
+            # Opening the download stream loads the file document, used to verify ownership
+            async with _transfer_semaphore:
+                grid_out = await bucket.open_download_stream(ObjectId(file_id))
+            metadata = grid_out.metadata or {}
+            if metadata.get("owner_email") != user_email:
                 return None  # Access denied
             
-            # Download the file content
-            content_stream = io.BytesIO()
-            await bucket.download_to_stream(ObjectId(file_id), content_stream)
-            file_bytes = content_stream.getvalue()
-            
             # Use display_name for download filename if available
-            download_filename = file_doc.metadata.get("display_name", file_doc.filename)
+            download_filename = metadata.get("display_name", grid_out.filename)
             
             return {
-                "content": file_bytes,
+                "stream": self._iter_chunks(grid_out),  # Read lazily, one GridFS chunk at a time
                 "filename": download_filename,  # Use display name for download
-                "original_filename": file_doc.filename,  # Keep original for reference
-                "content_type": file_doc.metadata.get("content_type", "application/octet-stream"),
-                "size": file_doc.length
+                "original_filename": grid_out.filename,  # Keep original for reference
+                "content_type": metadata.get("content_type", "application/octet-stream"),
+                "size": grid_out.length
             }
             
         except NoFile:
             return None
-        except StopAsyncIteration:
-            return None  # No file found
         except Exception as e:
             print(f"Error downloading file {file_id}: {e}")
             return None
     
+    @staticmethod
+    async def _iter_chunks(grid_out) -> AsyncIterator[bytes]:
+        """Yield the content of an open GridFS download stream chunk by chunk"""
+        while True:
+            async with _transfer_semaphore:
+                chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+    
     async def get_file_info(self, file_id: str, user_email: str, user_id: str) -> Optional[Dict[str, Any]]:
         """
         Get file information (only if owned by user)
@@ -277,47 +479,17 @@ class FileService:
             Dict with file info, or None if not found/no access
         """
         try:
-            bucket = await self._get_bucket()
-            
-            cursor = bucket.find({"_id": ObjectId(file_id)})
-            file_doc = await cursor.next()
+            # Ownership is part of the query: not found and access denied both return None
+            file_doc = await self._find_owned_file(ObjectId(file_id), user_email)
             if not file_doc:
                 return None
-                
-            if file_doc.metadata.get("owner_email") != user_email:
-                return None  # Access denied
             
-            # Use display_name if available, fallback to original filename
-            display_name = file_doc.metadata.get("display_name", file_doc.filename)
-            return {
-                "id": str(file_doc._id),
-                "name": display_name,  # Always show display name to user
-                "original_name": file_doc.filename,  # Keep original for reference
-                "size": self._format_file_size(file_doc.length),
-                "size_bytes": file_doc.length,
-                "content_type": file_doc.metadata.get("content_type", "unknown"),
-                "uploaded": file_doc.upload_date.strftime("%Y-%m-%d"),
-                "upload_datetime": file_doc.upload_date.isoformat(),
-                "owner": file_doc.metadata.get("owner_email", user_email)
-            }
+            return self._doc_to_info(file_doc)
             
-        except StopAsyncIteration:
-            return None  # No file found
         except Exception as e:
             print(f"Error getting file info for {file_id}: {e}")
             return None
     
-    def _format_file_size(self, size_bytes: int) -> str:
-        """Format file size in human readable format"""
-        if size_bytes < 1024:
-            return f"{size_bytes} B"
-        elif size_bytes < 1024 * 1024:
-            return f"{size_bytes / 1024:.1f} KB"
-        elif size_bytes < 1024 * 1024 * 1024:
-            return f"{size_bytes / (1024 * 1024):.1f} MB"
-        else:
-            return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
-    
     async def rename_file(self, file_id: str, new_display_name: str, user_email: str, user_id: str) -> Dict[str, Any]:
         """
         Rename a file by updating its display name only (PATCH operation)
@@ -332,17 +504,8 @@ class FileService:
             Dict with success status and message
         """
         try:
-            bucket = await self._get_bucket()
             file_id_obj = ObjectId(file_id)
             
-            # First verify the file exists and user owns it
-            file_info = await self.get_file_info(file_id, user_email, user_id)
-            if not file_info:
-                return {
-                    "success": False,
-                    "error": "File not found or access denied"
-                }
-            
             # Validate new display name
             if not new_display_name.strip():
                 return {
@@ -356,32 +519,9 @@ class FileService:
                     "error": "Display name too long (max 255 characters)"
                 }
             
-            # Update only the display name in GridFS metadata
-            # Access the underlying MongoDB database and fs.files collection
-            # GridFS stores metadata in fs.files collection
-            # Get database from the bucket's underlying client
-            from database import database  # Import at runtime to ensure it's initialized
-            if database is None:
-                return {
-                    "success": False,
-                    "error": "Database not initialized"
-                }
-            fs_files_collection = database.fs.files
-            
-            # Debug: Let's see what we're searching for vs what's in the database
-            print(f"🔍 DEBUG - Looking for file:")
-            print(f"   file_id: {file_id_obj}")
-            print(f"   owner_email: {user_email}")
-            print(f"   owner_id: {user_id}")
-            
-            # First, let's see what's actually in the database
-            actual_file = await fs_files_collection.find_one({"_id": file_id_obj})
-            if actual_file:
-                print(f"🔍 DEBUG - Found file in DB:")
-                print(f"   actual owner_email: {actual_file.get('metadata', {}).get('owner_email')}")
-                print(f"   actual owner_id: {actual_file.get('metadata', {}).get('owner_id')}")
-            else:
-                print(f"❌ DEBUG - File not found in database!")
+            # Update only the display name in GridFS metadata (images.files collection);
+            # the owner filter doubles as the existence/ownership check
+            fs_files_collection = self._files_coll
             
             result = await fs_files_collection.update_one(
                 {
@@ -392,27 +532,29 @@ class FileService:
                 {
                     "$set": {
                         "metadata.display_name": new_display_name.strip(),
-                        "metadata.renamed_at": datetime.datetime.utcnow()
+                        "metadata.renamed_at": datetime.now(timezone.utc)
                     }
                 }
             )
             
-            print(f"🔍 DEBUG - Update result: matched={result.matched_count}, modified={result.modified_count}")
-            
-            if result.modified_count > 0:
-                return {
-                    "success": True,
-                    "message": f"File display name updated to '{new_display_name.strip()}'",
-                    "new_display_name": new_display_name.strip()
-                }
-            else:
+            if result.matched_count == 0:
                 return {
                     "success": False,
-                    "error": "Failed to update display name - file may not exist or access denied"
+                    "error": "File not found or access denied"
                 }
+            
+            return {
+                "success": True,
+                "message": f"File display name updated to '{new_display_name.strip()}'",
+                "new_display_name": new_display_name.strip()
+            }
                 
         except Exception as e:
             return {
                 "success": False,
                 "error": f"Rename failed: {str(e)}"
             }
+
+
+# Shared instance: FileService holds no per-request state, so bucket handles are resolved once per process
+file_service = FileService()
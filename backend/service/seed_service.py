@@ -7,10 +7,11 @@ Seed service for trading data.
 
 import asyncio
 import logging
-from datetime import datetime, timezone
-from typing import Optional
+from datetime import datetime, time, timedelta, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo.errors import DuplicateKeyError
 
-from core.config import settings
 from core.database import get_database
 from cmd_trading.seed_instruments import seed_instruments
 from cmd_trading.flow_stock_metrics import seed_instrument_prices, seed_leaderboards_only
@@ -20,11 +21,41 @@ logger = logging.getLogger("seed_service")
 
 _seed_lock = asyncio.Lock()
 
+# Margin after UTC midnight before the daily seed runs (absorbs small clock skew)
+SEED_AFTER_MIDNIGHT_SECONDS = 60
+
+# Callbacks run after each seed that writes trading data (e.g. to drop query caches)
+_seed_listeners: List[Callable[[], None]] = []
+
+
+def on_seed_complete(callback: Callable[[], None]) -> None:
+    """Register a callback run after every daily or on-demand seed"""
+    _seed_listeners.append(callback)
+
+
+def _notify_seed_complete() -> None:
+    for callback in _seed_listeners:
+        try:
+            callback()
+        except Exception as exc:
+            logger.error("❌ Seed listener %r failed: %s", callback, exc)
+
+
+def seconds_until_next_seed() -> float:
+    """Seconds until the scheduler's next daily seed (upper bound for caching seeded data)"""
+    return _seconds_until_next_utc_midnight() + SEED_AFTER_MIDNIGHT_SECONDS
+
 
 def _utc_today_str() -> str:
     return datetime.now(timezone.utc).date().isoformat()
 
 
+def _seconds_until_next_utc_midnight() -> float:
+    now = datetime.now(timezone.utc)
+    next_midnight = datetime.combine(now.date() + timedelta(days=1), time.min, tzinfo=timezone.utc)
+    return (next_midnight - now).total_seconds()
+
+
 async def _get_job_state(job_name: str) -> Optional[dict]:
     db = get_database()
     return await db.job_runs.find_one({"_id": job_name})
@@ -32,11 +63,16 @@ async def _get_job_state(job_name: str) -> Optional[dict]:
 
 async def _set_job_state(job_name: str, last_run_date: str) -> None:
     db = get_database()
-    await db.job_runs.update_one(
-        {"_id": job_name},
-        {"$set": {"last_run_date": last_run_date, "updated_at": datetime.now(timezone.utc)}},
-        upsert=True,
-    )
+    try:
+        # Only write when the date changes ($ne also matches a missing field / new job)
+        await db.job_runs.update_one(
+            {"_id": job_name, "last_run_date": {"$ne": last_run_date}},
+            {"$set": {"last_run_date": last_run_date, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # Same date already recorded: the upsert's insert collides on _id, nothing to do
+        pass
 
 
 async def ensure_instruments_seeded() -> bool:
@@ -45,9 +81,11 @@ async def ensure_instruments_seeded() -> bool:
     Returns True if seeding was performed.
     """
     db = get_database()
-    count = await db.instruments.count_documents({})
-    if count > 0:
-        logger.info("✅ Instruments already seeded (%s)", count)
+    # Only emptiness matters: stop at the first document instead of counting them all
+    sample = await db.instruments.find_one({}, {"_id": 1})
+    if sample is not None:
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("✅ Instruments already seeded (~%s)", await db.instruments.estimated_document_count())
         return False
 
     logger.info("🌱 No instruments found. Seeding instruments...")
@@ -71,32 +109,56 @@ async def run_daily_seed_if_due() -> bool:
     logger.info("📈 Running daily trading seed for %s", today)
     await seed_instrument_prices()
     await seed_leaderboards_only()
+    _notify_seed_complete()
     await _set_job_state("daily_trading_seed", today)
     logger.info("✅ Daily trading seed completed for %s", today)
     return True
 
 
+async def run_seed_checks() -> bool:
+    """
+    Seed instruments if empty and run the daily seed if due.
+    Returns True if any seeding was performed.
+    """
+    async with _seed_lock:
+        seeded_instruments = await ensure_instruments_seeded()
+        ran_daily_seed = await run_daily_seed_if_due()
+
+        # If no daily seed was needed, do cleanup
+        #if not ran_daily_seed and not seeded_instruments:
+            #await run_single_cleanup()
+
+    return seeded_instruments or ran_daily_seed
+
+
+async def run_seed_now(seed_fn: Callable[[], Awaitable[None]]) -> None:
+    """
+    Run a seed function on demand (admin endpoints), serialized with the scheduler.
+    The scheduler only holds the lock while seeding, never across its sleep.
+    """
+    async with _seed_lock:
+        await seed_fn()
+    _notify_seed_complete()
+
+
 def start_seed_scheduler():
     """
     Create and return a background task for seeding + cleanup scheduling.
     """
-    interval_minutes = getattr(settings, "seed_check_interval_minutes", 60)
-    logger.info("🕐 Creating seed scheduler: check every %s minutes", interval_minutes)
+    logger.info("🕐 Creating seed scheduler: daily seed after each UTC midnight")
 
     async def seed_loop():
         await asyncio.sleep(10)  # short delay after startup
 
         while True:
             try:
-                async with _seed_lock:
-                    seeded_instruments = await ensure_instruments_seeded()
-                    ran_daily_seed = await run_daily_seed_if_due()
-
-                    # If no daily seed was needed, do cleanup
-                    #if not ran_daily_seed and not seeded_instruments:
-                        #await run_single_cleanup()
+                # Shielded: cancellation can't stop a seed between writing data and recording job state
+                await asyncio.shield(run_seed_checks())
 
-                await asyncio.sleep(interval_minutes * 60)
+                # Today's seed is done: nothing is due before the next UTC day
+                delay = seconds_until_next_seed()
+                logger.info("💤 Next seed check in %.0f seconds", delay)
+                await asyncio.sleep(delay)
 
             except asyncio.CancelledError:
                 logger.info("🛑 Seed scheduler cancelled")
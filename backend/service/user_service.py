@@ -1,22 +1,62 @@
 """
 User service for authentication and user management
 """
+import asyncio
 import httpx
-from typing import Optional, Dict, Any
-import random
-import string
+import logging
+import orjson
+from typing import Awaitable, Callable, Optional, Dict, Any
+import secrets
+import threading
+from bson import ObjectId
 from core.auth import User
-from service.file_service import FileService
+from core.ttl_cache import TTLCache
+from service.file_service import file_service
+
+logger = logging.getLogger("user_service")
 
 BASE_URL = "http://localhost:8000"
 
+# Max concurrent GridFS deletes when an account's bulk file delete falls back to per-file deletes
+FILE_DELETE_CONCURRENCY = 16
+
+# Shared HTTP client for the auth API: keeps connections alive across calls
+_client: Optional[httpx.AsyncClient] = None
+
+def _new_http_client() -> httpx.AsyncClient:
+    """Create an auth API client with keep-alive pooling"""
+    return httpx.AsyncClient(
+        base_url=BASE_URL,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        timeout=10.0
+    )
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared auth API client (created on first use)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _new_http_client()
+    return _client
+
+async def close_http_client() -> None:
+    """Close the shared auth API client (on application shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+# Profiles fetched after login, keyed by email: repeat logins skip the /users/me call
+PROFILE_CACHE_TTL_SECONDS = 300
+PROFILE_CACHE_MAX_SIZE = 10_000
+_profile_cache = TTLCache(PROFILE_CACHE_TTL_SECONDS, PROFILE_CACHE_MAX_SIZE)
+
 class UserService:
-    def __init__(self, base_url: str = BASE_URL):
-        self.base_url = base_url
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        self.client = client or get_http_client()
     
     async def authenticate_email_async(self, email: str, password: str = "defaultpassword123", 
                                      first_name: str = "Test", last_name: str = "User", 
-                                     create: bool = True) -> Dict[str, Any]:
+                                     create: bool = True, fetch_profile: bool = True) -> Dict[str, Any]:
         """
         Authenticate user by email. If user doesn't exist and create=True, creates the user first.
         Returns session data with token on success.
@@ -27,61 +67,76 @@ class UserService:
             first_name: First name for new users
             last_name: Last name for new users  
             create: Whether to create user if doesn't exist
+            fetch_profile: Whether to include the user profile (costs a /users/me call after login)
             
         Returns:
             Dict with authentication result containing token and user info
         """
-        async with httpx.AsyncClient() as client:
-            # First, try to login
-            login_result = await self._try_login(client, email, password)
-            
-            if login_result["success"]:
-                return login_result
+        client = self.client
+        
+        # First, try to login
+        login_result = await self._try_login(client, email, password, fetch_profile)
+        
+        if login_result["success"]:
+            return login_result
+        
+        # If login failed and create=True, try to register first
+        if create:
+            logger.info("User %s doesn't exist or login failed. Attempting to create user...", email)
+            register_result = await self._try_register(client, email, password, first_name, last_name)
             
-            # If login failed and create=True, try to register first
-            if create:
-                print(f"User {email} doesn't exist or login failed. Attempting to create user...")
-                register_result = await self._try_register(client, email, password, first_name, last_name)
-                
-                if register_result["success"]:
-                    # Try login again after registration
-                    login_result = await self._try_login(client, email, password)
-                    if login_result["success"]:
-                        return login_result
-                    else:
-                        return {
-                            "success": False,
-                            "error": "User created but login failed",
-                            "details": login_result
-                        }
+            if register_result["success"]:
+                # Try login again after registration; the register response already is the profile
+                login_result = await self._try_login(client, email, password)
+                if login_result["success"]:
+                    if fetch_profile and login_result["token"]:
+                        login_result["user_profile"] = register_result["user_data"]
+                        login_result["session_data"]["user"] = register_result["user_data"]
+                        _profile_cache.set(email, register_result["user_data"])
+                    return login_result
                 else:
-                    return register_result
+                    return {
+                        "success": False,
+                        "error": "User created but login failed",
+                        "details": login_result
+                    }
             else:
-                return {
-                    "success": False,
-                    "error": "User authentication failed and create=False",
-                    "details": login_result
-                }
+                return register_result
+        else:
+            return {
+                "success": False,
+                "error": "User authentication failed and create=False",
+                "details": login_result
+            }
     
-    async def _try_login(self, client: httpx.AsyncClient, email: str, password: str) -> Dict[str, Any]:
-        """Try to login with email/password"""
+    async def _try_login(self, client: httpx.AsyncClient, email: str, password: str,
+                         fetch_profile: bool = False) -> Dict[str, Any]:
+        """Try to login with email/password, optionally fetching the user profile"""
         try:
             login_data = {
                 "username": email,
                 "password": password
             }
             
-            response = await client.post(f"{self.base_url}/auth/jwt/login", data=login_data)
+            response = await client.post("/auth/jwt/login", data=login_data)
             
             if response.status_code == 200:
                 # BearerTransport returns token in response body
-                token_data = response.json()
+                token_data = orjson.loads(response.content)
                 
-                # Get user profile with the token
-                headers = {"Authorization": f"Bearer {token_data['access_token']}"}
-                profile_response = await client.get(f"{self.base_url}/users/me", headers=headers)
+                # Built once per token and handed back in session_data, so callers reuse it
+                auth_headers = {"Authorization": f"Bearer {token_data['access_token']}"}
                 
-                user_profile = profile_response.json() if profile_response.status_code == 200 else {}
+                # Get user profile with the token (only if requested and not cached)
+                user_profile = {}
+                if fetch_profile:
+                    user_profile = _profile_cache.get(email)
+                    if user_profile is None:
+                        profile_response = await client.get("/users/me", headers=auth_headers)
+                        user_profile = {}
+                        if profile_response.status_code == 200:
+                            user_profile = orjson.loads(profile_response.content)
+                            _profile_cache.set(email, user_profile)
                 
                 return {
                     "success": True,
@@ -92,6 +147,7 @@ class UserService:
                     "session_data": {
                         "access_token": token_data["access_token"],
                         "token_type": token_data["token_type"],
+                        "headers": auth_headers,
                         "user": user_profile
                     }
                 }
@@ -143,13 +199,13 @@ class UserService:
                 "last_name": last_name
             }
             
-            response = await client.post(f"{self.base_url}/auth/register", json=user_data)
+            response = await client.post("/auth/register", json=user_data)
             
             if response.status_code == 201:
                 return {
                     "success": True,
                     "action": "register",
-                    "user_data": response.json()
+                    "user_data": orjson.loads(response.content)
                 }
             else:
                 return {
@@ -177,74 +233,84 @@ class UserService:
         Returns:
             Dict with success/failure status and details
         """
+        user_task = None
         try:
-            print(f"🗑️ Starting account deletion for user: {user_email} (ID: {user_id})")
+            logger.info("🗑️ Starting account deletion for user: %s (ID: %s)", user_email, user_id)
+            
+            if not ObjectId.is_valid(user_id):
+                return {
+                    "success": False,
+                    "error": "User not found or ID mismatch - access denied"
+                }
+            
+            # Look the user up in the background while the files are being deleted.
+            # Matching on both email and ID makes the query itself the security check.
+            user_task = asyncio.ensure_future(
+                User.find_one(User.email == user_email, User.id == ObjectId(user_id))
+            )
             
             # Step 1: Delete all user files using FileService
-            print("📁 Deleting user files...")
-            file_service = FileService()
+            logger.debug("📁 Deleting user files...")
             
-            # Get all user files first
-            user_files = await file_service.list_user_files(user_email, user_id)
+            # Get the ids of all user files first
+            file_ids = await file_service.list_user_file_ids(user_email, user_id)
             
-            if user_files:
-                print(f"Found {len(user_files)} files to delete")
-                files_deleted = 0
-                files_failed = 0
+            if file_ids:
+                logger.debug("Found %d files to delete", len(file_ids))
                 
-                for file_info in user_files:
-                    file_id = file_info['id']
-                    file_name = file_info['name']
+                # Remove all files with one bulk delete per GridFS collection
+                bulk_result = await file_service.bulk_delete_files(file_ids, user_email, user_id)
+                if bulk_result.get("success"):
+                    files_deleted = bulk_result["deleted_count"]
+                else:
+                    # Fall back to regular GridFS deletes, a few at a time
+                    logger.warning("⚠️ %s, falling back to per-file deletes", bulk_result.get('error'))
+                    semaphore = asyncio.Semaphore(FILE_DELETE_CONCURRENCY)
                     
-                    try:
-                        delete_result = await file_service.delete_file(file_id, user_email, user_id)
-                        if delete_result.get("success"):
-                            files_deleted += 1
-                            print(f"✅ Deleted file: {file_name}")
-                        else:
-                            files_failed += 1
-                            print(f"❌ Failed to delete file {file_name}: {delete_result.get('error')}")
-                    except Exception as e:
-                        files_failed += 1
-                        print(f"❌ Exception deleting file {file_name}: {str(e)}")
+                    async def _delete(file_id: ObjectId) -> Dict[str, Any]:
+                        async with semaphore:
+                            return await file_service.delete_file(str(file_id), user_email, user_id)
+                    
+                    results = await asyncio.gather(*(_delete(file_id) for file_id in file_ids), return_exceptions=True)
+                    files_deleted = sum(
+                        1 for delete_result in results
+                        if not isinstance(delete_result, Exception) and delete_result.get("success")
+                    )
+                files_failed = len(file_ids) - files_deleted
                 
-                print(f"📊 File deletion summary: {files_deleted} deleted, {files_failed} failed")
+                logger.info("📊 File deletion summary: %d deleted, %d failed", files_deleted, files_failed)
             else:
-                print("No files found for user")
+                logger.debug("No files found for user")
             
             # Step 2: Delete the user from database
-            print("👤 Deleting user from database...")
+            logger.debug("👤 Deleting user from database...")
             
             # Find the user by email and ID
-            user = await User.find_one(User.email == user_email)
+            user = await user_task
             
             if not user:
                 return {
                     "success": False,
-                    "error": f"User not found: {user_email}"
-                }
-            
-            # Verify the user ID matches (security check)
-            if str(user.id) != user_id:
-                return {
-                    "success": False,
-                    "error": "User ID mismatch - access denied"
+                    "error": "User not found or ID mismatch - access denied"
                 }
             
             # Delete the user
             await user.delete()
+            _profile_cache.pop(user_email)
             
-            print(f"✅ User {user_email} successfully deleted from database")
+            logger.info("✅ User %s successfully deleted from database", user_email)
             
             return {
                 "success": True,
                 "message": f"Account {user_email} successfully deleted",
-                "files_deleted": len(user_files) if user_files else 0,
+                "files_deleted": len(file_ids),
                 "user_deleted": True
             }
             
         except Exception as e:
-            print(f"❌ Account deletion failed: {str(e)}")
+            if user_task is not None:
+                user_task.cancel()
+            logger.error("❌ Account deletion failed: %s", e)
             return {
                 "success": False,
                 "error": f"Account deletion failed: {str(e)}"
@@ -252,10 +318,10 @@ class UserService:
 
 def generate_random_email() -> str:
     """Generate a random test email"""
-    random_part = ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
-    return f"testuser_{random_part}@example.com"
+    return f"testuser_{secrets.token_hex(4)}@example.com"
 
-async def register_async(email: str, password: str, first_name: str, last_name: str) -> Dict[str, Any]:
+async def register_async(email: str, password: str, first_name: str, last_name: str,
+                         client: Optional[httpx.AsyncClient] = None) -> Dict[str, Any]:
     """
     Register a new user (or authenticate if already exists).
     This is a convenience function that always attempts to create the user.
@@ -266,11 +332,12 @@ async def register_async(email: str, password: str, first_name: str, last_name:
         password: User password
         first_name: User's first name
         last_name: User's last name
+        client: HTTP client to use (default: the shared client)
         
     Returns:
         Dict with authentication result containing token and user info
     """
-    service = UserService()
+    service = UserService(client)
     return await service.authenticate_email_async(
         email=email,
         password=password, 
@@ -279,24 +346,37 @@ async def register_async(email: str, password: str, first_name: str, last_name:
         create=True
     )
 
-# Synchronous wrappers for easier use in non-async contexts
+# Synchronous wrappers for easier use in non-async contexts.
+# They run on one persistent background loop with its own client, so repeated
+# calls reuse the loop and the client's keep-alive connections.
+_sync_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_loop_lock = threading.Lock()
+_sync_client: Optional[httpx.AsyncClient] = None
+
+def _run_sync(coro_fn: Callable[[httpx.AsyncClient], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Run coro_fn(client) on the background loop and wait for its result"""
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="user-service-loop", daemon=True).start()
+    
+    async def _run():
+        global _sync_client
+        if _sync_client is None:
+            _sync_client = _new_http_client()
+        return await coro_fn(_sync_client)
+    
+    return asyncio.run_coroutine_threadsafe(_run(), _sync_loop).result()
+
 def authenticate_email(email: str, password: str = "defaultpassword123", 
                       first_name: str = "Test", last_name: str = "User", 
                       create: bool = True) -> Dict[str, Any]:
     """Synchronous wrapper for authenticate_email_async"""
-    import asyncio
-    
-    async def _run():
-        service = UserService()
-        return await service.authenticate_email_async(email, password, first_name, last_name, create)
-    
-    return asyncio.run(_run())
+    return _run_sync(lambda client: UserService(client).authenticate_email_async(
+        email, password, first_name, last_name, create
+    ))
 
 def register_email(email: str, password: str, first_name: str, last_name: str) -> Dict[str, Any]:
     """Synchronous wrapper for register_async"""
-    import asyncio
-    
-    async def _run():
-        return await register_async(email, password, first_name, last_name)
-    
-    return asyncio.run(_run())
+    return _run_sync(lambda client: register_async(email, password, first_name, last_name, client))
@@ -1,17 +1,30 @@
 """
 Process Manager for shell command execution
-Handles command creation and execution with proper subprocess management
+Handles command creation and execution in warm worker processes (see command_worker.py)
 """
 
 import asyncio
 import functools
-import subprocess
-import json
-from datetime import datetime
-from motor.motor_asyncio import AsyncIOMotorClient
+import logging
+from datetime import datetime, timedelta
 from bson import ObjectId
-from typing import Dict, Any
+from pymongo import ReturnDocument
+from typing import Dict, Any, Optional, Callable, Awaitable, Set
 from core.config import settings
+from core.database import get_client
+from shell import command_worker
+
+logger = logging.getLogger("command_manager")
+
+# Seconds shutdown waits for running commands before cancelling them
+COMMAND_SHUTDOWN_TIMEOUT_SECONDS = 10
+
+# Background process_command tasks started by _submit_command
+_running_tasks: Set[asyncio.Task] = set()
+
+def _get_db():
+    """Get the commands database from the shared motor client"""
+    return get_client()[settings.database_name]
 
 async def create_command(shell_command: str, args: Dict[str, Any]) -> str:
     """
@@ -24,8 +37,7 @@ async def create_command(shell_command: str, args: Dict[str, Any]) -> str:
     Returns:
         str: The created command ID
     """
-    client = AsyncIOMotorClient(settings.mongodb_url)
-    db = client[settings.database_name]
+    db = _get_db()
     
     command_doc = {
         "shell_command": shell_command,
@@ -39,10 +51,44 @@ async def create_command(shell_command: str, args: Dict[str, Any]) -> str:
     }
     
     result = await db.commands.insert_one(command_doc)
-    client.close()
     
     return str(result.inserted_id)
 
+# Pending/running commands older than this are not reused (see find_recent_command)
+RUNNING_COMMAND_REUSE_MINUTES = 5
+
+async def find_recent_command(shell_command: str, match: Dict[str, Any], max_age_hours: int) -> Optional[str]:
+    """
+    Find a reusable command: a successful one created within the last max_age_hours,
+    or a pending/running one created within the last RUNNING_COMMAND_REUSE_MINUTES
+    
+    Args:
+        shell_command: The command name to look for
+        match: Extra filter on the command document (e.g. {"args.video_id": ...})
+        max_age_hours: Only successful commands created after now - max_age_hours are considered
+        
+    Returns:
+        str: The most recent matching command ID, or None
+    """
+    db = _get_db()
+    now = datetime.utcnow()
+    
+    command_doc = await db.commands.find_one(
+        {
+            "shell_command": shell_command,
+            "$or": [
+                {"exit_state": 0, "created_at": {"$gte": now - timedelta(hours=max_age_hours)}},
+                # An old -1 command was most likely orphaned by a restart: don't wait on it
+                {"exit_state": -1, "created_at": {"$gte": now - timedelta(minutes=RUNNING_COMMAND_REUSE_MINUTES)}}
+            ],
+            **match
+        },
+        projection={"_id": 1},
+        sort=[("created_at", -1)]
+    )
+    
+    return str(command_doc["_id"]) if command_doc else None
+
 async def process_command(command_id: str) -> Dict[str, Any]:
     """
     Execute a command and wait for completion
@@ -54,72 +100,45 @@ async def process_command(command_id: str) -> Dict[str, Any]:
     Returns:
         Dict containing execution results
     """
-    client = AsyncIOMotorClient(settings.mongodb_url)
-    db = client[settings.database_name]
+    db = _get_db()
+    oid = ObjectId(command_id)
     
     try:
         # Mark command as started
         await db.commands.update_one(
-            {"_id": ObjectId(command_id)},
+            {"_id": oid},
             {"$set": {"started_at": datetime.utcnow()}}
         )
         
-        # Execute the shell command and wait for completion
-        print(f"Starting subprocess for command: {command_id}")
-        
-        def run_subprocess(command_id):
-            process = subprocess.Popen(
-                ["python", "me_shell.py", command_id],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            stdout, stderr = process.communicate()
-            return process.returncode, stdout, stderr
-
-        loop = asyncio.get_running_loop()
-        exit_state, stdout, stderr = await loop.run_in_executor(
-            None, functools.partial(run_subprocess, command_id)
-        )
+        # Execute the shell command in a warm worker process and wait for completion
+        logger.info("Starting command in worker process: %s", command_id)
+        exit_state, stdout, stderr = await command_worker.run_command(command_id)
         
-        # Update the MongoDB command entry with final results
+        # Record the final state in a single write and read it back in the same round-trip
         update_data = {
+            "exit_state": exit_state,
             "completed_at": datetime.utcnow()
         }
         
-        # If the subprocess completed successfully, the me_shell.py should have
+        # If the command completed successfully, me_shell.run_command should have
         # already updated stdout/stderr. But we capture the process output too.
         if exit_state == 0:
-            print(f"Command {command_id} completed successfully")
+            logger.info("Command %s completed successfully", command_id)
             if stdout.strip():
-                print(f"Process stdout: {stdout}")
+                logger.debug("Process stdout: %s", stdout)
         else:
-            print(f"Command {command_id} failed with exit code {exit_state}")
+            logger.warning("Command %s failed with exit code %s", command_id, exit_state)
             if stderr.strip():
-                print(f"Process stderr: {stderr}")
+                logger.debug("Process stderr: %s", stderr)
             
-            # Update with subprocess error if me_shell.py didn't handle it
-            await db.commands.update_one(
-                {"_id": ObjectId(command_id)},
-                {
-                    "$set": {
-                        "exit_state": exit_state,
-                        "stderr": stderr if stderr.strip() else "Command failed with no error output",
-                        **update_data
-                    }
-                }
-            )
-        
-        # If exit_state is 0, me_shell.py should have already updated the record
-        if exit_state == 0:
-            await db.commands.update_one(
-                {"_id": ObjectId(command_id)},
-                {"$set": update_data}
-            )
+            # Update with the worker error if me_shell.run_command didn't record it
+            update_data["stderr"] = stderr if stderr.strip() else "Command failed with no error output"
         
-        # Return final command state
-        final_command = await db.commands.find_one({"_id": ObjectId(command_id)})
-        client.close()
+        final_command = await db.commands.find_one_and_update(
+            {"_id": oid},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
+        ) or {}
         
         return {
             "command_id": command_id,
@@ -129,13 +148,29 @@ async def process_command(command_id: str) -> Dict[str, Any]:
             "completed_at": final_command.get("completed_at")
         }
         
+    except asyncio.CancelledError:
+        # The pool was shut down (app shutdown) or this task cancelled: don't leave the
+        # command looking like it is still running, then let the cancellation through
+        logger.warning("Command %s cancelled", command_id)
+        await asyncio.shield(db.commands.update_one(
+            {"_id": oid},
+            {
+                "$set": {
+                    "exit_state": 2,  # 2 = process management error
+                    "stderr": "Command cancelled before completion",
+                    "completed_at": datetime.utcnow()
+                }
+            }
+        ))
+        raise
+        
     except Exception as e:
         # Handle any errors in process management
         error_msg = f"Process management error: {str(e)}"
-        print(f"ERROR: {error_msg}")
+        logger.error("%s", error_msg)
         
         await db.commands.update_one(
-            {"_id": ObjectId(command_id)},
+            {"_id": oid},
             {
                 "$set": {
                     "exit_state": 2,  # 2 = process management error
@@ -144,7 +179,6 @@ async def process_command(command_id: str) -> Dict[str, Any]:
                 }
             }
         )
-        client.close()
         
         return {
             "command_id": command_id,
@@ -164,12 +198,10 @@ async def get_command_status(command_id: str) -> Dict[str, Any]:
     Returns:
         Dict containing command status and results
     """
-    client = AsyncIOMotorClient(settings.mongodb_url)
-    db = client[settings.database_name]
+    db = _get_db()
     
     try:
         command_doc = await db.commands.find_one({"_id": ObjectId(command_id)})
-        client.close()
         
         if not command_doc:
             return {
@@ -190,8 +222,73 @@ async def get_command_status(command_id: str) -> Dict[str, Any]:
         }
         
     except Exception as e:
-        client.close()
         return {
             "error": f"Failed to get command status: {str(e)}",
             "command_id": command_id
         }
+
+async def _submit_command(shell_command: str, args: Dict[str, Any]) -> str:
+    """
+    Create a command and start processing it in the background
+    
+    Args:
+        shell_command: The command name to execute
+        args: JSON-serializable arguments for the command
+        
+    Returns:
+        str: The created command ID
+    """
+    command_id = await create_command(shell_command, args)
+    task = asyncio.create_task(process_command(command_id))
+    # Keep a reference so the task isn't garbage collected and shutdown can await it
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+    return command_id
+
+async def wait_for_running_commands(timeout: float = COMMAND_SHUTDOWN_TIMEOUT_SECONDS) -> None:
+    """
+    Wait for in-flight commands to record their final state (application shutdown)
+    
+    Commands still running after timeout are cancelled, which marks them as
+    failed (exit_state 2). Must run before the database client is closed.
+    
+    Args:
+        timeout: Seconds to wait for the running commands to finish
+    """
+    if not _running_tasks:
+        return
+    
+    tasks = set(_running_tasks)
+    logger.info("Waiting for %d running command(s)", len(tasks))
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    if pending:
+        logger.warning("Cancelling %d command(s) still running after %ss", len(pending), timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+# Pre-bound submit functions per shell command, resolved once at import time by routes
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[str]]] = {}
+
+def register_handler(name: str) -> Callable[[Dict[str, Any]], Awaitable[str]]:
+    """
+    Register a shell command name and return its submit function
+    
+    The name must match a key of COMMAND_REGISTRY in cmd_tools/tools_commands.py,
+    which me_shell.run_command uses to run the command.
+    """
+    HANDLERS[name] = functools.partial(_submit_command, name)
+    return HANDLERS[name]
+
+for _name in (
+    "MergePdfs",
+    "SplitPdfs",
+    "MergeImages",
+    "XlsToPdf",
+    "youtube_summary",
+    "PdfToHtml",
+    "HtmlSummary",
+    "call_llm",
+    "GenerateLmnpLiasse",
+):
+    register_handler(_name)
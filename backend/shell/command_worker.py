@@ -0,0 +1,82 @@
+"""
+Warm worker processes for shell command execution
+Each worker imports me_shell (and every command handler) once, initializes the
+database once on its own event loop, then runs commands one at a time.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+from core.config import settings
+
+# Event loop of the current worker process, kept for all the commands it runs
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _init_worker() -> None:
+    """Worker initializer: create the worker's event loop and initialize the database on it"""
+    global _worker_loop
+    from core.database import init_db
+
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    _worker_loop.run_until_complete(init_db())
+
+def _run_command(command_id: str) -> Tuple[int, str, str]:
+    """Run one command in this worker (see me_shell.run_command)"""
+    from me_shell import run_command
+
+    return _worker_loop.run_until_complete(run_command(command_id))
+
+# Shared pool - created on first use
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_pool() -> ProcessPoolExecutor:
+    """Get the command worker pool (created on first use)"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.command_worker_processes,
+            # Spawn, not fork: the API process already runs threads and a motor client
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            # Recycle workers periodically so a leaking command can't degrade one for good
+            max_tasks_per_child=settings.command_worker_max_tasks
+        )
+    return _pool
+
+async def run_command(command_id: str) -> Tuple[int, str, str]:
+    """
+    Run a command in a worker process
+
+    Args:
+        command_id: The ID of the command to execute
+
+    Returns:
+        Tuple of (exit_state, stdout, stderr)
+    """
+    pool = get_pool()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, _run_command, command_id)
+    except BrokenProcessPool:
+        # A worker died (e.g. crashed in native code): replace this pool for later commands
+        shutdown_pool(pool)
+        raise
+
+def shutdown_pool(pool: Optional[ProcessPoolExecutor] = None) -> None:
+    """
+    Stop the worker processes without blocking; the next command starts a fresh pool
+
+    Called on application shutdown (current pool), and with the pool that broke when
+    a worker died. A pool that was already replaced is left alone, so late callers
+    from the broken pool never cancel commands queued on its replacement.
+    """
+    global _pool
+    if pool is None:
+        pool = _pool
+    if pool is None or pool is not _pool:
+        return
+    _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)